@@ -0,0 +1,49 @@
+"""
+Agent and model cache for the TeachAssist Streamlit apps.
+
+Streamlit re-executes the app script on every interaction, so building a BedrockModel (and its boto3
+client) and an Agent per query throws away warm clients and connection pools. Models are cached for the
+whole process, keyed on (model id, temperature): they are stateless and safe to share between sessions.
+Agents keep a conversation history and are not safe for concurrent use, so they are cached per session,
+keyed on (agent name, model id, temperature, enabled tools), and reset every time they are handed out.
+"""
+
+import streamlit as st
+from strands import Agent
+from strands.models import BedrockModel
+
+AGENT_CACHE_KEY = "agent_cache"
+
+
+@st.cache_resource(show_spinner=False)
+def get_bedrock_model(model_id, temperature):
+    """Return the process-wide BedrockModel for a model id and temperature."""
+    return BedrockModel(model_id=model_id, temperature=temperature)
+
+
+def tool_names(tools):
+    """Stable names of the tools given to an agent, used in cache keys."""
+    return tuple(getattr(tool, "tool_name", None) or getattr(tool, "__name__", repr(tool)) for tool in tools)
+
+
+def get_cached_agent(name, model_id, temperature, tools, **agent_kwargs):
+    """
+    Return this session's agent for the given configuration, building it on first use.
+
+    The conversation history is cleared on every checkout, so a cached agent behaves like a freshly
+    built one while reusing the warm model and tool registry.
+    """
+    cache = st.session_state.setdefault(AGENT_CACHE_KEY, {})
+    key = (name, model_id, temperature, tool_names(tools))
+    agent = cache.get(key)
+    if agent is None:
+        agent = Agent(model=get_bedrock_model(model_id, temperature), tools=list(tools), **agent_kwargs)
+        cache[key] = agent
+    else:
+        agent.messages.clear()
+    return agent
+
+
+def invalidate_agents():
+    """Drop this session's cached agents, e.g. when the sidebar settings change."""
+    st.session_state.pop(AGENT_CACHE_KEY, None)
@@ -0,0 +1,87 @@
+"""
+Background agent jobs for the TeachAssist Streamlit apps.
+
+Running an agent inside the script run blocks the session until Bedrock answers, and ties up one of
+the server's script threads for the whole call. Agent calls are submitted here instead, to a thread
+pool shared by every session of the process. The script run returns straight away, and a fragment
+polls the job to draw its progress until the job is done.
+
+A job doubles as the placeholder of a StreamingResponse: streamed text is kept on the job and the
+polling fragment draws it. A stopped job stops streaming at the next event. A blocking agent call
+cannot be interrupted, so it runs to completion in the background and its result is thrown away.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from streaming_response import CURSOR
+
+# Shared by all sessions of this process: the workers mostly wait on Bedrock
+job_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("AGENT_JOB_WORKERS", 32)),
+    thread_name_prefix="agent-job",
+)
+
+
+class AgentJob:
+    """An agent call running on the shared executor."""
+    def __init__(self, fn, executor=job_executor):
+        """
+        Args:
+            fn: function(job) returning the response text. It must not use the Streamlit session:
+                agents, history and settings are resolved by the caller in the script thread
+            executor: executor running the job
+        """
+        self.status = "Working..."
+        self.text = ""
+        self.submitted_at = time.perf_counter()
+        self._stopped = threading.Event()
+        self.future = executor.submit(self._run, fn)
+
+    def _run(self, fn):
+        if self._stopped.is_set():
+            return None
+        return fn(self)
+
+    def markdown(self, text):
+        """Placeholder interface used by StreamingResponse: keep the partial response for the next poll."""
+        self.text = text
+
+    def set_status(self, status):
+        """Describe what the job is doing, shown while no text has been streamed."""
+        self.status = status
+
+    def stop(self):
+        """Stop the job: it does not start if it is still queued, and its result is discarded otherwise."""
+        self._stopped.set()
+        self.future.cancel()
+
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def done(self):
+        return self._stopped.is_set() or self.future.done()
+
+    def elapsed(self):
+        return time.perf_counter() - self.submitted_at
+
+    def outcome(self):
+        """
+        Final message of a finished job
+        Returns:
+            the response text, the partial response of a stopped job, or an error message
+        """
+        if self._stopped.is_set():
+            partial = self.text.split(CURSOR)[0].strip()
+            return f"{partial}\n\n_Stopped._" if partial else "_Stopped._"
+        try:
+            return self.future.result()
+        except Exception as e:
+            return f"An error occurred: {str(e)}"
+
+
+def submit_job(fn):
+    """Run fn(job) in the background and return its AgentJob."""
+    return AgentJob(fn)
@@ -0,0 +1,200 @@
+"""
+Streamlit building blocks shared by the TeachAssist apps (streamlit_app.py, app_kb.py, app_kb_mem.py).
+
+Each app renders these sidebar panels and keeps this session state the same way, so they live here
+instead of being pasted into every app script.
+"""
+
+import os
+import uuid
+
+import streamlit as st
+
+from agent_cache import get_bedrock_model, invalidate_agents
+from chat_history_store import chat_history_store
+from conversation_window import ConversationWindow, make_summarizer
+from query_router import query_router
+from retrieval_cache import retrieval_cache
+from speculative_routing import speculation_metrics
+from stage_metrics import stage_log
+from strands_multi_agent_example.model_cascade import cascade_stats
+from strands_multi_agent_example.specialist_pool import pool_stats
+from streaming_response import timing_stats
+
+# Model folding older turns into the conversation summary
+SUMMARY_MODEL_ID = "us.amazon.nova-micro-v1:0"
+
+# Hand the bounded conversation history to the teacher and knowledge base agents (off: one query at a time)
+CONVERSATION_CONTEXT = os.environ.get("CONVERSATION_CONTEXT", "0") == "1"
+
+# Number of messages rendered per page of history
+HISTORY_PAGE_SIZE = 20
+
+
+def show_router_stats():
+    """Local router statistics (process-wide)."""
+    router_stats = query_router.stats()
+    st.sidebar.caption(
+        f"Local router: {router_stats['hit_rate']:.0%} of {router_stats['total']} routing decisions made locally, "
+        f"mean confidence {router_stats['mean_confidence']:.2f}"
+    )
+
+
+def streaming_toggle():
+    """
+    Sidebar switch for streamed answers, rendered as they are generated instead of all at once
+    Returns:
+        True when answers should be streamed
+    """
+    use_streaming = st.sidebar.checkbox("Stream responses", value=True)
+    stream_stats = timing_stats()
+    if stream_stats["responses"]:
+        st.sidebar.caption(
+            f"Streaming: first token after {stream_stats['p50_first_token_seconds']:.2f}s, complete after "
+            f"{stream_stats['p50_total_seconds']:.1f}s (median of {stream_stats['responses']} responses)"
+        )
+    return use_streaming
+
+
+def speculation_toggle():
+    """
+    Sidebar switch for speculative retrieval: the knowledge base lookup starts while the query is routed
+    Returns:
+        True when retrieval should be speculative
+    """
+    use_speculation = st.sidebar.checkbox(
+        "Speculative retrieval",
+        value=True,
+        help="Retrieve from the knowledge base while routing, and discard the result if the query goes elsewhere"
+    )
+    speculation_stats = speculation_metrics.snapshot()
+    st.sidebar.caption(
+        f"Speculative retrieval: {speculation_stats['used']} used, {speculation_stats['discarded']} discarded, "
+        f"{speculation_stats['saved_seconds']:.1f}s saved, {speculation_stats['wasted_seconds']:.1f}s wasted"
+    )
+    return use_speculation
+
+
+def show_stage_metrics():
+    """Per-stage latency and token usage, specialist pools and model cascades (process-wide)."""
+    with st.sidebar.expander("Stage metrics"):
+        last_query_stages = stage_log.last_query()
+        if last_query_stages:
+            st.caption("Last query")
+            st.table([
+                {
+                    "stage": r["stage"],
+                    "wall_ms": round(r["wall_ms"]),
+                    "bedrock_ms": round(r["bedrock_latency_ms"]),
+                    "tokens_in": r["input_tokens"],
+                    "tokens_out": r["output_tokens"],
+                }
+                for r in last_query_stages
+            ])
+            st.caption(f"Recent queries (logged to {stage_log.path or 'memory only'})")
+            st.table(stage_log.summary())
+        else:
+            st.caption("No query yet")
+        st.caption("Specialist agent pools")
+        st.table([
+            {**stats, "mean_wait_ms": round(stats["mean_wait_ms"], 1), "max_wait_ms": round(stats["max_wait_ms"], 1)}
+            for stats in pool_stats()
+        ])
+        st.caption("Specialist model cascades (cheapest model first)")
+        st.table([
+            {
+                "cascade": stats["cascade"],
+                "queries": stats["queries"],
+                "escalated": f"{stats['escalated']} ({stats['escalation_rate']:.0%})",
+                "reasons": ", ".join(f"{reason}: {count}" for reason, count in stats["escalations"].items()),
+                "cost_usd": round(stats["cost_usd"], 4),
+                "saved_usd": round(stats["saved_usd"], 4),
+                "saved_s": round(stats["saved_ms"] / 1000, 1),
+            }
+            for stats in cascade_stats()
+        ])
+
+
+def show_retrieval_cache_stats():
+    """Retrieval cache statistics (process-wide)."""
+    cache_stats = retrieval_cache.stats()
+    st.sidebar.caption(
+        f"Retrieval cache: {cache_stats['hit_rate']:.0%} hit rate over {cache_stats['hits'] + cache_stats['misses']} "
+        f"lookups, {cache_stats['entries']} cached results"
+    )
+
+
+def session_user_id(user_name=None):
+    """
+    Identify the user for per-user caches and history
+    Args:
+        user_name (str): authenticated user name, used when given. Otherwise one id per browser session,
+            kept in the URL so that reloading the page (or restarting the server) restores the conversation
+    """
+    if "user_id" not in st.session_state:
+        if user_name:
+            st.session_state.user_id = user_name
+        else:
+            st.session_state.user_id = st.query_params.get("session") or uuid.uuid4().hex
+            st.query_params["session"] = st.session_state.user_id
+    return st.session_state.user_id
+
+
+def get_conversation(user_id):
+    """
+    The session's conversation window: recent turns verbatim, restored from the chat history store on the
+    first run of a session. With CONVERSATION_CONTEXT, the agents get this history and older turns are
+    summarized in the background; otherwise nothing is summarized and the agents see one query at a time
+    """
+    if "conversation" not in st.session_state:
+        summarizer = make_summarizer(get_bedrock_model(SUMMARY_MODEL_ID, 0.1)) if CONVERSATION_CONTEXT else None
+        st.session_state.conversation = ConversationWindow(
+            summarizer=summarizer,
+            max_turns=int(os.environ.get("CONVERSATION_MAX_TURNS", 6)),
+            history_token_budget=int(os.environ.get("CONVERSATION_TOKEN_BUDGET", 3000)),
+            store=chat_history_store,
+            user_id=user_id,
+            agent_context=CONVERSATION_CONTEXT,
+        )
+    return st.session_state.conversation
+
+
+def _show_older_messages():
+    st.session_state.history_shown += HISTORY_PAGE_SIZE
+
+
+def show_history(conversation, user_id):
+    """Display the conversation history: only the most recent page, older pages on demand."""
+    st.session_state.setdefault("history_shown", HISTORY_PAGE_SIZE)
+    history_size = chat_history_store.count(user_id)
+    if history_size > st.session_state.history_shown:
+        if conversation.summary:
+            with st.expander("Earlier in this conversation"):
+                st.markdown(conversation.summary)
+        st.button(
+            f"Load older messages ({history_size - st.session_state.history_shown} more)",
+            on_click=_show_older_messages,
+        )
+    for message in chat_history_store.recent(user_id, st.session_state.history_shown):
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+
+@st.fragment(run_every=0.5)
+def show_agent_job(conversation):
+    """Show the answer being prepared in the background, polling its job until it is done."""
+    job = st.session_state.get("agent_job")
+    if job is None:
+        return
+    if not job.done():
+        st.markdown(job.text or f"_{job.status}_ ({job.elapsed():.0f}s)")
+        if st.button("Stop", key="stop_agent_job"):
+            job.stop()
+            # A stopped blocking call keeps running in the background: do not reuse its agents
+            invalidate_agents()
+            st.rerun()
+        return
+    # The job is finished: move its answer into the conversation and redraw the page
+    st.session_state.agent_job = None
+    conversation.add("assistant", job.outcome())
+    st.rerun()
@@ -1,8 +1,17 @@
 import streamlit as st
-from strands import Agent
-from strands.models import BedrockModel
 from strands_tools import use_agent, memory
 
+from app_components import (
+    get_conversation, session_user_id, show_agent_job, show_history, show_retrieval_cache_stats,
+    show_router_stats, show_stage_metrics, streaming_toggle,
+)
+from agent_cache import get_cached_agent
+from agent_jobs import submit_job
+from query_router import query_router
+from retrieval_cache import retrieval_cache
+from stage_metrics import QueryTrace, stage_log, trace_stage
+from streaming_response import run_agent
+
 # Import the specialized assistants
 from strands_multi_agent_example.computer_science_assistant import computer_science_assistant
 from strands_multi_agent_example.english_assistant import english_assistant
@@ -119,55 +128,79 @@ Example response for missing information:
 # Bypass tool consent
 os.environ["BYPASS_TOOL_CONSENT"] = "true"
 
+# Specify the Bedrock ModelID
+MODEL_ID = "us.amazon.nova-pro-v1:0"
+
 # Set up the page
 st.set_page_config(page_title="TeachAssist - Educational Assistant", layout="wide")
 st.title("TeachAssist - Educational Assistant")
 st.write("Ask a question in any subject area or store/retrieve personal information.")
 
-# Initialize session state for conversation history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Local router statistics (process-wide)
+show_router_stats()
+
+# Streaming: render the answer as it is generated instead of waiting for the whole response
+use_streaming = streaming_toggle()
+
+# Per-stage latency and token usage (process-wide)
+show_stage_metrics()
+
+# Identify the user for per-user caches and history: one id per browser session, kept in the URL
+# so that reloading the page (or restarting the server) restores the conversation
+user_id = session_user_id()
+
+# Retrieval cache statistics (process-wide)
+show_retrieval_cache_stats()
+
+# Initialize the conversation window: recent turns verbatim, older turns summarized in the background
+conversation = get_conversation(user_id)
 
-# Display conversation history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Display conversation history: only the most recent page, older pages on demand
+show_history(conversation, user_id)
 
 # Initialize the teacher agent
-@st.cache_resource
 def get_teacher_agent():
-    # Specify the Bedrock ModelID
-    bedrock_model = BedrockModel(
-        model_id="us.amazon.nova-pro-v1:0",
-        temperature=0.3,
-    )
-    
-    # Create the teacher agent with specialized tools
-    return Agent(
-        model=bedrock_model,
+    # Reuse the teacher agent with specialized tools (the model is shared by all sessions)
+    agent = get_cached_agent(
+        "teacher",
+        MODEL_ID,
+        0.3,
+        [math_assistant, language_assistant, english_assistant, computer_science_assistant, general_assistant],
         system_prompt=TEACHER_SYSTEM_PROMPT,
         callback_handler=None,
-        tools=[math_assistant, language_assistant, english_assistant, computer_science_assistant, general_assistant],
     )
+    # Give the agent the bounded conversation history (none unless CONVERSATION_CONTEXT is on)
+    agent.messages.extend(conversation.context_messages())
+    return agent
 
 # Initialize the knowledge base agent
-@st.cache_resource
 def get_kb_agent():
-    # Specify the Bedrock ModelID
-    bedrock_model = BedrockModel(
-        model_id="us.amazon.nova-pro-v1:0",
-        temperature=0.3,
-    )
-    
-    # Create the knowledge base agent with memory tools
-    return Agent(
-        model=bedrock_model,
-        tools=[memory, use_agent],
+    # Reuse the knowledge base agent with memory tools
+    return get_cached_agent("knowledgebase", MODEL_ID, 0.3, [memory, use_agent])
+
+# Knowledge base retrieval parameters
+RETRIEVE_PARAMS = {
+    "min_score": 0.4,  # Set reasonable minimum score threshold
+    "max_results": 9,  # Retrieve a good number of results
+}
+
+def retrieve_memories(agent, query, user_id):
+    """Query the knowledge base, reusing the user's recent results for the same query."""
+    return retrieval_cache.get_or_retrieve(
+        user_id,
+        query,
+        lambda: agent.tool.memory(action="retrieve", query=query, **RETRIEVE_PARAMS),
+        **RETRIEVE_PARAMS
     )
 
-def determine_action(query):
+def determine_action(query, decision=None, agent=None):
     """Determine if the query should be handled by the teacher agent or knowledge base agent."""
-    agent = get_kb_agent()
+    # Use the local router when it is confident, and only ask the LLM otherwise
+    decision = decision or query_router.route(query)
+    if decision.action is not None:
+        return decision.action
+
+    agent = agent if agent is not None else get_kb_agent()
     
     result = agent.tool.use_agent(
         prompt=f"Query: {query}",
@@ -183,83 +216,92 @@ def determine_action(query):
     else:
         return "knowledgebase"
 
-def run_kb_agent(query):
+def run_kb_agent(query, decision=None, placeholder=None, agent=None, history=None, trace=None):
     """Process a user query with the knowledge base agent."""
-    agent = get_kb_agent()
-    
-    # Determine the action - store or retrieve
-    result = agent.tool.use_agent(
-        prompt=f"Query: {query}",
-        system_prompt=KB_ACTION_SYSTEM_PROMPT
-    )
+    agent = agent if agent is not None else get_kb_agent()
     
-    # Clean and extract the action
-    action_text = str(result).lower().strip()
+    # Determine the action - store or retrieve (locally when the router is confident)
+    decision = decision or query_router.route(query)
+    with trace_stage(trace, "store_retrieve", local=decision.kb_action is not None):
+        if decision.kb_action is not None:
+            action_text = decision.kb_action
+        else:
+            result = agent.tool.use_agent(
+                prompt=f"Query: {query}",
+                system_prompt=KB_ACTION_SYSTEM_PROMPT
+            )
+        
+            # Clean and extract the action
+            action_text = str(result).lower().strip()
     
     # Default to retrieve if response isn't clear
     if "store" in action_text:
         # For store actions, store the full query
-        agent.tool.memory(action="store", content=query)
+        with trace_stage(trace, "store"):
+            agent.tool.memory(action="store", content=query)
+        # The user's cached retrievals no longer reflect what they stored
+        retrieval_cache.invalidate_user(user_id)
         return "I've stored this information."
     else:
-        # For retrieve actions, query the knowledge base with appropriate parameters
-        result = agent.tool.memory(
-            action="retrieve", 
-            query=query,
-            min_score=0.4,  # Set reasonable minimum score threshold
-            max_results=9   # Retrieve a good number of results
-        )
+        # For retrieve actions, query the knowledge base (or reuse a recent identical lookup)
+        with trace_stage(trace, "retrieve"):
+            result = retrieve_memories(agent, query, user_id)
         # Convert the result to a string to extract just the content text
         result_str = str(result)
         
-        # Generate a clear, conversational answer using the retrieved information
-        answer = agent(
-            prompt=f"User question: \"{query}\"\n\nInformation from knowledge base (only use 'Response'):\n{result_str}\n\nProvide a helpful answer based on this information:",
-            invocation_state={"system_prompt": ANSWER_SYSTEM_PROMPT}
-        )
+        # Generate a clear, conversational answer using the retrieved information, in the context of the
+        # conversation so far when CONVERSATION_CONTEXT is on (ahead of the routing and retrieval tool calls)
+        agent.messages[:0] = history if history is not None else conversation.context_messages()
+        with trace_stage(trace, "answer", agent):
+            answer = run_agent(
+                agent,
+                f"User question: \"{query}\"\n\nInformation from knowledge base (only use 'Response'):\n{result_str}\n\nProvide a helpful answer based on this information:",
+                placeholder,
+                invocation_state={"system_prompt": ANSWER_SYSTEM_PROMPT}
+            )
         return str(answer)
 
-# Get user input
-query = st.chat_input("Ask your question here...")
+# Get user input (disabled while an answer is being prepared)
+query = st.chat_input("Ask your question here...", disabled=st.session_state.get("agent_job") is not None)
 
 if query:
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": query})
+    conversation.add("user", query)
     
     # Display user message
     with st.chat_message("user"):
         st.markdown(query)
     
-    # Display assistant response
-    with st.chat_message("assistant"):
-        message_placeholder = st.empty()
-        
+    # Resolve agents, settings and history here: the job runs outside of the Streamlit session
+    trace = QueryTrace("app_kb", stage_log)
+    with trace.stage("router") as stage:
+        decision = query_router.route(query)
+        stage.update(source=decision.source, label=decision.label, confidence=decision.confidence)
+    teacher_agent = get_teacher_agent()
+    kb_agent = get_kb_agent()
+    history = conversation.context_messages()
+    
+    def process_query(job):
+        action = None
         try:
+            stream_to = job if use_streaming else None
             # Determine which agent should handle the query
-            with st.spinner("Analyzing query..."):
-                action = determine_action(query)
-            
-            content = ""
+            job.set_status("Analyzing query...")
+            with trace.stage("classify", local=decision.action is not None):
+                action = determine_action(query, decision, kb_agent)
+        
+            # Process with the appropriate agent
             if action == "teacher":
-                # Get the teacher agent
-                teacher_agent = get_teacher_agent()
-                
-                # Process the query with the teacher agent
-                with st.spinner("Consulting educational specialists..."):
-                    response = teacher_agent(query)
-                    content = str(response)
-            else:
-                # Process the query with the knowledge base agent
-                with st.spinner("Accessing knowledge base..."):
-                    content = run_kb_agent(query)
-            
-            # Display the response
-            message_placeholder.markdown(content)
-            
-            # Add assistant response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": content})
-            
-        except Exception as e:
-            error_message = f"An error occurred: {str(e)}"
-            message_placeholder.markdown(error_message)
-            st.session_state.messages.append({"role": "assistant", "content": error_message})
+                job.set_status("Processing with Teacher Agent...")
+                with trace.stage("teacher", teacher_agent):
+                    return run_agent(teacher_agent, query, stream_to)
+            job.set_status("Processing with Knowledge Base Agent...")
+            return run_kb_agent(query, decision, stream_to, kb_agent, history, trace)
+        finally:
+            trace.finish(action=action)
+
+    st.session_state.agent_job = submit_job(process_query)
+
+if st.session_state.get("agent_job") is not None:
+    with st.chat_message("assistant"):
+        show_agent_job(conversation)
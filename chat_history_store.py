@@ -0,0 +1,85 @@
+"""
+Persistent chat history for the TeachAssist Streamlit apps.
+
+Messages are appended to a local SQLite database, keyed by user (or browser session), together with the
+running conversation summary. A session can then be restored after the process restarts, and the apps
+only read and render the most recent page of a conversation, whatever its length.
+
+SQLite connections cannot be shared between threads, so every call opens its own. With the database in
+WAL mode, readers do not wait for writers.
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+class ChatHistoryStore:
+    """SQLite-backed chat messages and conversation summaries, per user."""
+    def __init__(self, path):
+        """
+        Args:
+            path (str): SQLite database file, created on first use
+        """
+        self.path = path
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS messages_by_user ON messages (user_id, id)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS summaries (user_id TEXT PRIMARY KEY, summary TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def append(self, user_id, role, content):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO messages (user_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, role, str(content), time.time())
+            )
+
+    def count(self, user_id):
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM messages WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def recent(self, user_id, limit):
+        """
+        Most recent messages of a user
+        Returns:
+            list of up to limit {"role", "content"} dicts, oldest first
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT role, content FROM messages WHERE user_id = ? ORDER BY id DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def save_summary(self, user_id, summary):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO summaries (user_id, summary, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET summary = excluded.summary, updated_at = excluded.updated_at",
+                (user_id, summary, time.time())
+            )
+
+    def load_summary(self, user_id):
+        with self._connect() as connection:
+            row = connection.execute("SELECT summary FROM summaries WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else ""
+
+
+# Shared by every session of the process
+chat_history_store = ChatHistoryStore(os.environ.get("CHAT_HISTORY_DB", "chat_history.db"))
@@ -0,0 +1,159 @@
+"""
+Bounded conversation window for the TeachAssist Streamlit apps.
+
+A tutoring session can go on for a long time. Keeping every message in the session, and handing all of
+them to the agents, makes each turn slower and more expensive than the one before. ConversationWindow
+keeps the last max_turns turns verbatim and folds older ones into a running summary. The summary is
+written by a cheap model on a background thread, so the user never waits for it. Messages that have
+left the window but are not summarized yet are still sent verbatim.
+
+Handing the history to the agents is opt-in (agent_context): it changes the prompts, the answers and the
+cost of every call. Without it the agents answer each query on its own, as before, and the window only
+bounds what the session keeps in memory.
+
+The history handed to an agent is also capped by a token budget: the oldest turns go first, and the
+summary is cut as a last resort. Tokens are estimated from the text length, which is close enough for
+a budget.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from strands import Agent
+
+SUMMARY_SYSTEM_PROMPT = """
+You maintain a running summary of a tutoring conversation between a student and TeachAssist.
+Given the current summary and the messages that follow it, write an updated summary that:
+- Keeps the topics covered, the questions asked and the key answers, results and explanations
+- Keeps what the student said about themselves, their level and their goals
+- Drops greetings, repetitions and formatting
+Write at most 200 words of plain text. Return only the updated summary.
+"""
+
+# Shared by all sessions: summaries are short calls to a small model
+summary_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summarizer")
+
+
+def estimate_tokens(text):
+    """Rough token count: about four characters per token for English text."""
+    return len(text) // 4 + 1
+
+
+def make_summarizer(model):
+    """
+    Build a summarizer function backed by a model, meant to be small and cheap
+    Args:
+        model: strands model, e.g. a BedrockModel for Nova Micro
+    Returns:
+        function(summary, messages) returning the updated summary
+    """
+    def summarize(summary, messages):
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        # A fresh agent per call: summaries run concurrently for different sessions
+        agent = Agent(model=model, system_prompt=SUMMARY_SYSTEM_PROMPT, callback_handler=None)
+        return str(agent(f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}")).strip()
+    return summarize
+
+
+class ConversationWindow:
+    """Recent messages verbatim plus a running summary of the older ones."""
+    def __init__(self, summarizer=None, max_turns=6, history_token_budget=3000, store=None, user_id=None,
+                 agent_context=False):
+        """
+        Args:
+            summarizer: function(summary, messages) returning an updated summary, e.g. from make_summarizer.
+                Older messages are dropped without a summary when None
+            max_turns (int): number of user/assistant turns kept verbatim
+            history_token_budget (int): maximum number of tokens of history handed to an agent per request
+            store (ChatHistoryStore): optional persistent history. The window is restored from it, and
+                messages and summaries are saved to it
+            user_id (str): user (or session) the history belongs to in the store
+            agent_context (bool): hand the bounded history to the agents. context_messages() is empty when False
+        """
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.history_token_budget = history_token_budget
+        self.store = store
+        self.user_id = user_id
+        self.agent_context = agent_context
+        self.messages = []
+        self.summary = ""
+        if store is not None:
+            # Restore the session: the last turns verbatim, older ones through the saved summary
+            self.messages = store.recent(user_id, 2 * max_turns)
+            self.summary = store.load_summary(user_id)
+        self._unsummarized = []
+        self._job = None
+        self._job_size = 0
+
+    def add(self, role, content):
+        """Add a message, moving the oldest ones out of the window when it is full."""
+        self.messages.append({"role": role, "content": str(content)})
+        if self.store is not None:
+            self.store.append(self.user_id, role, content)
+        overflow = len(self.messages) - 2 * self.max_turns
+        if overflow > 0:
+            if self.summarizer is not None:
+                self._unsummarized.extend(self.messages[:overflow])
+            del self.messages[:overflow]
+        self._refresh()
+
+    def _refresh(self):
+        """Apply a finished summary, and start summarizing the messages that left the window since."""
+        if self._job is not None:
+            if not self._job.done():
+                return
+            job, self._job = self._job, None
+            try:
+                self.summary = job.result()
+                del self._unsummarized[:self._job_size]
+                if self.store is not None:
+                    self.store.save_summary(self.user_id, self.summary)
+            except Exception as e:
+                # Keep the messages: they are sent verbatim and summarized on the next attempt
+                print(f"Conversation summary failed: {e}")
+        if self._unsummarized:
+            self._job_size = len(self._unsummarized)
+            self._job = summary_executor.submit(self.summarizer, self.summary, list(self._unsummarized))
+
+    def context_messages(self):
+        """
+        Conversation history to hand to an agent before the current query
+        Returns:
+            list of strands messages: the summary as an opening exchange, then the most recent messages
+            that fit in the token budget. Roles alternate, starting with user and ending with assistant.
+            Empty when agent_context is off
+        """
+        if not self.agent_context:
+            return []
+        self._refresh()
+        recent = self._unsummarized + self.messages
+        # The trailing user message is the query being answered, which the agent gets as its prompt
+        if recent and recent[-1]["role"] == "user":
+            recent = recent[:-1]
+
+        budget = self.history_token_budget
+        kept = []
+        for message in reversed(recent):
+            tokens = estimate_tokens(message["content"])
+            if tokens > budget:
+                break
+            kept.append(message)
+            budget -= tokens
+        kept.reverse()
+
+        history = []
+        summary = self.summary
+        if summary and budget > 0:
+            if estimate_tokens(summary) > budget:
+                summary = summary[:budget * 4]
+            history.append({"role": "user", "content": [{"text": f"Summary of our conversation so far:\n{summary}"}]})
+            history.append({"role": "assistant", "content": [{"text": "Thanks, I will keep that in mind."}]})
+        for message in kept:
+            if history and history[-1]["role"] == message["role"]:
+                # Merge consecutive messages of the same role, e.g. after an error reply
+                history[-1]["content"].append({"text": message["content"]})
+            elif history or message["role"] == "user":
+                history.append({"role": message["role"], "content": [{"text": message["content"]}]})
+        if history and history[-1]["role"] == "user":
+            history.pop()
+        return history
@@ -2,14 +2,16 @@ import boto3
 import json
 import logging
 import os
-import re
-import requests
-import time
 import uuid
 import zipfile
 
 
-from knowledge_base import BedrockKnowledgeBase
+from botocore.config import Config
+from knowledge_base import BedrockKnowledgeBase, wait_until
+from kb_downloader import RangedDownloader
+from kb_manifest import DOCUMENTS_PER_CALL, build_custom_documents, sync_custom_data_source
+from kb_uploader import BulkUploader
+from kb_zip_stream import normalize_member_name, stream_zip_to_s3
 from tqdm import tqdm
 from urllib.parse import urlparse
 
@@ -25,29 +27,28 @@ else:
     print("Cannot determine AWS region from `AWS_REGION` environment variable or from `boto3.session.Session().region_name`")
     raise
 
-s3_client = boto3.client('s3', region)
+# Number of files uploaded concurrently by upload_directory
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '16'))
+
+# The connection pool must be large enough for all upload workers and their multipart threads
+s3_client = boto3.client('s3', region, config=Config(max_pool_connections=UPLOAD_WORKERS * 4))
 bedrock_agent_client = boto3.client('bedrock-agent', region)
 bedrock_agent_runtime_client = boto3.client('bedrock-agent-runtime', region)
 
 
-def download_file(url):
+def download_file(url, sha256=None):
     destination = os.path.basename(urlparse(url).path)
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        file_size = int(response.headers.get('content-length', 0))
-
-        with open(destination, 'wb') as file, tqdm(
+        downloader = RangedDownloader()
+        file_size, _, _ = downloader.probe(url)
+        with tqdm(
             desc=destination,
             total=file_size,
             unit='B',
             unit_scale=True,
             unit_divisor=1024,
         ) as progress_bar:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    file.write(chunk)
-                    progress_bar.update(len(chunk))
+            downloader.download(url, destination, sha256=sha256, on_progress=progress_bar.update)
         return True
     except Exception as e:
         print(f"Error downloading file: {e}")
@@ -60,10 +61,10 @@ def extract_zip_file(zip_path):
             file_list = f.namelist()
             print(f"Extracting files from {zip_path}")
             for file in tqdm(file_list, desc="Extracting"):
-                if file.startswith('__') or '.DS_Store' in file:
+                clean_filename = normalize_member_name(file)
+                if clean_filename is None:
                     print(f'Skipping file: {file}')
                     continue
-                clean_filename = re.sub(r'[\s-]+', '-', file).lower()
                 f.extract(file, '.')
                 os.rename(file, clean_filename)
                 n_files += 1
@@ -105,15 +106,9 @@ def create_s3_bucket_with_random_suffix(prefix):
         print(f"Error creating bucket: {e}")
         return None
 
-def upload_directory(path, bucket_name):
-    for root,dirs,files in os.walk(path):
-        for file in files:
-            file_to_upload = os.path.join(root,file)
-            basename = os.path.basename(file_to_upload)
-            if basename == ".DS_Store":
-                continue
-            print(f"uploading file {file_to_upload} to {bucket_name}")
-            s3_client.upload_file(file_to_upload,bucket_name,file)
+def upload_directory(path, bucket_name, max_workers=UPLOAD_WORKERS):
+    uploader = BulkUploader(s3_client, bucket_name, max_workers=max_workers)
+    return uploader.upload_directory(path)
 
 def create_bedrock_knowledge_base(name, description, s3_bucket):
     knowledge_base = BedrockKnowledgeBase(
@@ -122,62 +117,91 @@ def create_bedrock_knowledge_base(name, description, s3_bucket):
         data_bucket_name=s3_bucket,
         embedding_model = "amazon.titan-embed-text-v2:0"
     )
-    print("Sleeping for 30 seconds.....")
-    time.sleep(30)
+    knowledge_base_id = knowledge_base.knowledge_base['knowledgeBaseId']
+    data_source_id = knowledge_base.data_source['dataSourceId']
+    wait_until(
+        lambda: bedrock_agent_client.get_knowledge_base(
+            knowledgeBaseId=knowledge_base_id
+        )['knowledgeBase']['status'] == 'ACTIVE',
+        f'Knowledge Base {knowledge_base_id} ACTIVE'
+    )
+    wait_until(
+        lambda: bedrock_agent_client.get_data_source(
+            knowledgeBaseId=knowledge_base_id,
+            dataSourceId=data_source_id
+        )['dataSource']['status'] == 'AVAILABLE',
+        f'Data Source {data_source_id} AVAILABLE'
+    )
     return knowledge_base
 
-def ingest_knowledge_base_documents(knowledge_base_id, data_source_id, s3_bucket, kb_folder):
-    # Ingest all files in folder into Bedrock Knowledge Base Custom Data Source
-    kb_files = [ file for file in os.listdir(kb_folder) if file.endswith('.pdf') ]
-
-    documents = []
-    for kb_file in kb_files:
-        s3_uri = f's3://{s3_bucket}/{kb_file}'
-        clean_filename = re.sub(r'[\s-]+', '-', kb_file)
-        custom_document_identifier = os.path.splitext(clean_filename)[0]
-        custom_document_identifier = custom_document_identifier.lower()
-        print(f'{s3_uri} -> Custom Document Identifier: "{custom_document_identifier}"')
-        documents.append(
-            {
-                'content': {
-                    'custom': {
-                        'customDocumentIdentifier': {
-                            'id': custom_document_identifier
-                        },
-                        's3Location': {
-                            'uri': s3_uri
-                        },
-                        'sourceType': 'S3_LOCATION'
-                    },
-                    'dataSourceType': 'CUSTOM'
-                }
-            }
-        )
+def list_bucket_documents(s3_bucket, suffix='.pdf'):
+    paginator = s3_client.get_paginator('list_objects_v2')
+    return [
+        obj['Key']
+        for page in paginator.paginate(Bucket=s3_bucket)
+        for obj in page.get('Contents', [])
+        if obj['Key'].endswith(suffix)
+    ]
+
+def ingest_knowledge_base_documents(knowledge_base_id, data_source_id, s3_bucket, kb_folder, manifest_path=None):
+    # Ingest all files in folder into Bedrock Knowledge Base Custom Data Source.
+    # With a manifest, only new or changed files are uploaded and ingested, and deleted files are removed.
+    # Without a local folder (streamed bootstrap), the documents already in the bucket are ingested
+    if manifest_path is not None and os.path.isdir(kb_folder):
+        try:
+            responses = sync_custom_data_source(
+                bedrock_agent_client, s3_client, knowledge_base_id, data_source_id, s3_bucket, kb_folder,
+                manifest_path, suffixes=('.pdf',), max_workers=UPLOAD_WORKERS
+            )
+        except Exception as e:
+            print(f'Exception: {e}')
+            return None
+        for response in responses:
+            print(json.dumps(response, indent=2, default=str))
+        return responses
+    if manifest_path is not None:
+        # An empty folder scan would delete every document of the manifest from the Knowledge Base
+        print(f'No local folder {kb_folder}: skipping the incremental sync, ingesting the bucket documents')
+    if os.path.isdir(kb_folder):
+        kb_files = [ file for file in os.listdir(kb_folder) if file.endswith('.pdf') ]
+    else:
+        kb_files = list_bucket_documents(s3_bucket)
+    responses = []
     try:
-        response = bedrock_agent_client.ingest_knowledge_base_documents(
-            dataSourceId = data_source_id,
-            documents=documents,
-            knowledgeBaseId = knowledge_base_id
-        )
-        print(json.dumps(response, indent=2, default=str))
+        for i in range(0, len(kb_files), DOCUMENTS_PER_CALL):
+            response = bedrock_agent_client.ingest_knowledge_base_documents(
+                dataSourceId = data_source_id,
+                documents=build_custom_documents(s3_bucket, kb_files[i:i + DOCUMENTS_PER_CALL]),
+                knowledgeBaseId = knowledge_base_id
+            )
+            print(json.dumps(response, indent=2, default=str))
+            responses.append(response)
     except Exception as e:
         print(f'Exception: {e}')
         return None
-    return response
-
+    return responses
 
 def main():
     folder = 'pets-kb-files'
-    if not os.path.isdir(folder):
-        download_file('https://d3k0crbaw2nl4d.cloudfront.net/pets-kb-files.zip')
+    dataset_url = 'https://d3k0crbaw2nl4d.cloudfront.net/pets-kb-files.zip'
+    # Set STREAMING_BOOTSTRAP=1 to stream the dataset archive straight into S3 without staging it on disk
+    streaming = os.getenv('STREAMING_BOOTSTRAP', '0') == '1'
+    s3_buckets = [ b['Name'] for b in s3_client.list_buckets()['Buckets'] if b['Name'].startswith('bedrock-kb-bucket') ]
+    if streaming and not s3_buckets:
+        s3_bucket = create_s3_bucket_with_random_suffix('bedrock-kb-bucket')
+        print(f'Created S3 bucket: {s3_bucket}')
+        stream_zip_to_s3(dataset_url, s3_client, s3_bucket, max_workers=UPLOAD_WORKERS)
+    elif streaming:
+        print(f'Skipping download as bucket {s3_buckets[0]} already exists.')
+        s3_bucket = s3_buckets[0]
+    elif not os.path.isdir(folder):
+        download_file(dataset_url)
         extract_zip_file('pets-kb-files.zip')
         s3_bucket = create_s3_bucket_with_random_suffix('bedrock-kb-bucket')
         print(f'Created S3 bucket: {s3_bucket}')
         upload_directory("pets-kb-files", s3_bucket)
     else:
         print('Skipping download as folder {folder} already exists.')
-        buckets = s3_client.list_buckets()['Buckets']
-        s3_buckets = [ b['Name'] for b in buckets if b['Name'].startswith('bedrock-kb-bucket') ]
         s3_bucket = s3_buckets[0]
 
     # Create Bedrock Knowledge Base
@@ -215,7 +239,8 @@ def main():
         knowledge_base_id = knowledge_base_id,
         data_source_id = data_source_id,
         s3_bucket = s3_bucket,
-        kb_folder = folder
+        kb_folder = folder,
+        manifest_path = os.getenv('KB_MANIFEST_PATH')
     )
 
 if __name__ == '__main__':
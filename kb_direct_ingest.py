@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+
+"""
+Direct ingestion path for the Knowledge Base OpenSearch vector index.
+
+Instead of going through a managed ingestion job, documents are chunked locally, embedded in batches
+through a pluggable embedder and streamed into the index with opensearchpy.helpers.parallel_bulk.
+The documents use the same field mapping as the Knowledge Base ("vector", "text", "text-metadata").
+
+Usage against a local OpenSearch stand-in, without AWS access:
+    python kb_direct_ingest.py pets-kb-files --host localhost --port 9200 --index my-index --fake-embedder
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
+from opensearchpy.helpers import parallel_bulk
+
+
+def chunk_text(text, max_tokens=512, overlap_percentage=20):
+    """
+    Split a text into fixed-size chunks, like the Knowledge Base FIXED_SIZE chunking strategy.
+    Tokens are approximated by whitespace separated words
+    Args:
+        text (str): text to split
+        max_tokens (int): maximum number of tokens per chunk
+        overlap_percentage (int): percentage of tokens shared by two consecutive chunks
+    Returns:
+        list of chunks
+    """
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, max_tokens - max_tokens * overlap_percentage // 100)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(' '.join(words[start:start + max_tokens]))
+        if start + max_tokens >= len(words):
+            break
+    return chunks
+
+
+class FakeEmbedder:
+    """
+    Deterministic embedder for offline tests: the same text always gives the same unit vector
+    """
+    def __init__(self, dimension=1024):
+        self.dimension = dimension
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            rng = random.Random(hashlib.sha256(text.encode('utf-8')).digest())
+            vector = [rng.gauss(0, 1) for _ in range(self.dimension)]
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+
+class BedrockEmbedder:
+    """
+    Embedder calling a Bedrock embedding model. Cohere models embed a whole batch per call,
+    Titan models embed one text per call, so batches are fanned out over a thread pool
+    """
+    def __init__(self, model_id="amazon.titan-embed-text-v2:0", dimension=1024, client=None, max_workers=8):
+        """
+        Class initializer
+        Args:
+            model_id (str): Bedrock embedding model
+            dimension (int): output dimension (Titan v2 supports 256, 512 and 1024)
+            client: bedrock-runtime client. Created if None
+            max_workers (int): concurrent InvokeModel calls for models without batch support
+        """
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            client = boto3.client('bedrock-runtime', config=Config(max_pool_connections=max_workers))
+        self.client = client
+        self.model_id = model_id
+        self.dimension = dimension
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _invoke(self, body):
+        response = self.client.invoke_model(modelId=self.model_id, body=json.dumps(body))
+        return json.loads(response['body'].read())
+
+    def _embed_titan(self, text):
+        return self._invoke({"inputText": text, "dimensions": self.dimension, "normalize": True})['embedding']
+
+    def embed(self, texts):
+        if self.model_id.startswith('cohere.'):
+            return self._invoke({"texts": list(texts), "input_type": "search_document"})['embeddings']
+        return list(self.executor.map(self._embed_titan, texts))
+
+
+def load_documents(folder):
+    """
+    Read the text of the documents in a folder. PDF files require the optional pypdf package
+    Args:
+        folder (str): folder containing the documents
+    Returns:
+        generator of (file name, text) tuples
+    """
+    for root, dirs, files in os.walk(folder):
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            if file.endswith(('.txt', '.md')):
+                with open(path, encoding='utf-8', errors='ignore') as f:
+                    yield file, f.read()
+            elif file.endswith('.pdf'):
+                try:
+                    from pypdf import PdfReader
+                except ImportError:
+                    print(f"Skipping {file}: install pypdf to ingest PDF documents")
+                    continue
+                yield file, '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+
+
+class DirectIngestor:
+    """
+    Support class that chunks, embeds and bulk-indexes documents into the Knowledge Base vector index
+    """
+    def __init__(self, oss_client, index_name, embedder, embed_batch_size=32, chunk_size=500, thread_count=4,
+                 max_tokens=512, overlap_percentage=20, vector_encoding="fp32"):
+        """
+        Class initializer
+        Args:
+            oss_client (OpenSearch): client of the collection holding the index
+            index_name (str): vector index name
+            embedder: object with an embed(texts) method returning one vector per text
+            embed_batch_size (int): number of chunks embedded per embedder call
+            chunk_size (int): number of documents per bulk request
+            thread_count (int): number of bulk requests in flight
+            max_tokens (int): maximum number of tokens per chunk
+            overlap_percentage (int): overlap between consecutive chunks
+            vector_encoding (str): encoding of the index vector field. Normalized embeddings are scaled to
+                integers in [-128, 127] for "byte" indexes, and sent as floats otherwise
+        """
+        self.oss_client = oss_client
+        self.index_name = index_name
+        self.embedder = embedder
+        self.embed_batch_size = embed_batch_size
+        self.chunk_size = chunk_size
+        self.thread_count = thread_count
+        self.max_tokens = max_tokens
+        self.overlap_percentage = overlap_percentage
+        self.vector_encoding = vector_encoding
+
+    def _actions(self, documents, stats):
+        batch = []
+        for source, text in documents:
+            stats['documents'] += 1
+            for chunk in chunk_text(text, self.max_tokens, self.overlap_percentage):
+                batch.append((source, chunk))
+                if len(batch) == self.embed_batch_size:
+                    yield from self._embed_batch(batch)
+                    batch = []
+        if batch:
+            yield from self._embed_batch(batch)
+
+    def _embed_batch(self, batch):
+        vectors = self.embedder.embed([chunk for _, chunk in batch])
+        if self.vector_encoding == "byte":
+            vectors = [[max(-128, min(127, round(v * 127))) for v in vector] for vector in vectors]
+        for (source, chunk), vector in zip(batch, vectors):
+            # OpenSearch Serverless vector collections assign document ids themselves
+            yield {
+                "_index": self.index_name,
+                "_source": {
+                    "vector": vector,
+                    "text": chunk,
+                    "text-metadata": json.dumps({"source": source}),
+                },
+            }
+
+    def ingest(self, documents):
+        """
+        Chunk, embed and index documents
+        Args:
+            documents (iterable): (source name, text) tuples, e.g. from load_documents
+        Returns:
+            dict with the number of documents, indexed and failed chunks, elapsed seconds, docs/s and chunks/s
+        """
+        stats = {'documents': 0, 'indexed': 0, 'failed': 0}
+        start = time.time()
+        for ok, item in parallel_bulk(
+                self.oss_client,
+                self._actions(documents, stats),
+                thread_count=self.thread_count,
+                chunk_size=self.chunk_size,
+                raise_on_error=False,
+        ):
+            if ok:
+                stats['indexed'] += 1
+            else:
+                stats['failed'] += 1
+                print(f"Failed to index chunk: {item}")
+        elapsed = max(time.time() - start, 1e-6)
+        stats['seconds'] = elapsed
+        stats['docs_per_second'] = stats['documents'] / elapsed
+        stats['chunks_per_second'] = stats['indexed'] / elapsed
+        print(f"Indexed {stats['indexed']} chunks from {stats['documents']} documents into {self.index_name} "
+              f"({stats['failed']} failed) in {elapsed:.1f}s: {stats['docs_per_second']:.1f} docs/s, "
+              f"{stats['chunks_per_second']:.1f} chunks/s")
+        return stats
+
+
+def build_oss_client(host, port=443, region=None):
+    """
+    Build an OpenSearch client. Local hosts use plain HTTP without authentication, other hosts are
+    treated as OpenSearch Serverless collections and signed with the current AWS credentials
+    """
+    if host in ('localhost', '127.0.0.1'):
+        return OpenSearch(hosts=[{'host': host, 'port': port}], use_ssl=False, timeout=300)
+    import boto3
+    session = boto3.Session()
+    auth = AWSV4SignerAuth(session.get_credentials(), region or session.region_name, 'aoss')
+    return OpenSearch(
+        hosts=[{'host': host, 'port': port}],
+        http_auth=auth,
+        use_ssl=True,
+        verify_certs=True,
+        connection_class=RequestsHttpConnection,
+        pool_maxsize=16,
+        timeout=300
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk, embed and bulk-index documents into a vector index")
+    parser.add_argument('folder', help="folder containing the documents")
+    parser.add_argument('--host', required=True, help="OpenSearch host (localhost for a local stand-in)")
+    parser.add_argument('--port', type=int, default=443)
+    parser.add_argument('--index', required=True, help="vector index name")
+    parser.add_argument('--fake-embedder', action='store_true', help="use deterministic offline embeddings")
+    parser.add_argument('--model-id', default="amazon.titan-embed-text-v2:0")
+    parser.add_argument('--dimension', type=int, default=1024)
+    parser.add_argument('--vector-encoding', default="fp32", choices=["fp32", "fp16", "byte"])
+    parser.add_argument('--embed-batch-size', type=int, default=32)
+    parser.add_argument('--chunk-size', type=int, default=500, help="documents per bulk request")
+    parser.add_argument('--thread-count', type=int, default=4, help="bulk requests in flight")
+    args = parser.parse_args()
+
+    if args.fake_embedder:
+        embedder = FakeEmbedder(args.dimension)
+    else:
+        embedder = BedrockEmbedder(args.model_id, args.dimension)
+    ingestor = DirectIngestor(
+        build_oss_client(args.host, args.port),
+        args.index,
+        embedder,
+        embed_batch_size=args.embed_batch_size,
+        chunk_size=args.chunk_size,
+        thread_count=args.thread_count,
+        vector_encoding=args.vector_encoding,
+    )
+    ingestor.ingest(load_documents(args.folder))
+
+
+if __name__ == '__main__':
+    main()
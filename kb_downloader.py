@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+
+"""
+Resumable, range-parallel HTTP downloader for Knowledge Base datasets.
+
+The file is split into fixed-size segments fetched concurrently with HTTP Range requests over a pooled
+session. Segments are written in place into a preallocated '.part' file, and completed segments are
+recorded in a JSON sidecar, so an interrupted download resumes where it stopped instead of restarting
+from zero. A resumed download takes the size and validator from the sidecar instead of probing the file
+again, and sends them as If-Range: a server whose file changed answers with the whole file, and the
+download restarts. The final file is verified against the advertised size and, optionally, a SHA-256
+checksum.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MB = 1024 * 1024
+
+
+class RemoteFileChanged(IOError):
+    """The remote file no longer matches the validator recorded for a partial download"""
+
+
+def is_strong_validator(etag):
+    """If-Range only works with a strong ETag or a Last-Modified date, not with a weak W/ ETag"""
+    return bool(etag) and not etag.startswith('W/')
+
+
+class RangedDownloader:
+    """
+    Support class that downloads large files in parallel segments and resumes partial downloads
+    """
+    def __init__(self, session=None, segment_size=8 * MB, max_workers=8, max_attempts=5, timeout=60):
+        """
+        Class initializer
+        Args:
+            session (requests.Session): session used for the requests. A pooled session is created if None
+            segment_size (int): number of bytes fetched per Range request
+            max_workers (int): number of segments fetched at the same time
+            max_attempts (int): attempts per segment before giving up
+            timeout (int): timeout in seconds of every request
+        """
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.segment_size = segment_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.state_lock = threading.Lock()
+
+    def probe(self, url):
+        """
+        Get the size, validator and Range support of a remote file
+        Args:
+            url (str): URL of the file
+        Returns:
+            tuple (size, etag, accepts_ranges)
+        """
+        response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        response.raise_for_status()
+        size = int(response.headers.get('content-length', 0))
+        etag = response.headers.get('etag') or response.headers.get('last-modified')
+        accepts_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+        return size, etag, accepts_ranges
+
+    @staticmethod
+    def read_state(state_path, url, segment_size):
+        """
+        Read the sidecar state of a partial download. A state for another URL or segment size is ignored
+        Returns:
+            dict with the size, etag and completed segment indexes, or None
+        """
+        if not os.path.exists(state_path):
+            return None
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except ValueError:
+            return None
+        if (state.get('url'), state.get('segment_size')) != (url, segment_size):
+            return None
+        return state
+
+    @staticmethod
+    def load_state(state_path, url, size, etag, segment_size):
+        """
+        Load the sidecar state of a partial download. A state for another URL, size, validator or segment
+        size is discarded
+        Returns:
+            set of the completed segment indexes
+        """
+        state = RangedDownloader.read_state(state_path, url, segment_size)
+        if state is None:
+            return set()
+        if (state.get('size'), state.get('etag')) != (size, etag):
+            print(f"Remote file changed since the partial download, restarting {url}")
+            return set()
+        return set(state.get('completed', []))
+
+    def save_state(self, state_path, url, size, etag, completed):
+        """
+        Atomically write the sidecar state of a partial download
+        """
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'url': url, 'size': size, 'etag': etag, 'segment_size': self.segment_size,
+                       'completed': sorted(completed)}, f)
+        os.replace(tmp_path, state_path)
+
+    def fetch_segment(self, url, part_path, index, size, on_progress=None, etag=None):
+        """
+        Fetch one segment and write it in place into the partial file, retrying with exponential backoff
+        Args:
+            etag (str): validator of the partial download, sent as If-Range when it is a strong one
+        Returns:
+            number of bytes written
+        Raises:
+            RemoteFileChanged: when the server answers If-Range with the whole (changed) file
+        """
+        start = index * self.segment_size
+        end = min(start + self.segment_size, size) - 1
+        headers = {'Range': f'bytes={start}-{end}'}
+        if is_strong_validator(etag):
+            headers['If-Range'] = etag
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                response.raise_for_status()
+                if response.status_code == 200 and 'If-Range' in headers:
+                    raise RemoteFileChanged(f"{url} changed since the partial download")
+                if response.status_code != 206 or len(response.content) != end - start + 1:
+                    raise IOError(f"Unexpected response for bytes {start}-{end}: HTTP {response.status_code}, "
+                                  f"{len(response.content)} bytes")
+                with open(part_path, 'r+b') as f:
+                    f.seek(start)
+                    f.write(response.content)
+                if on_progress:
+                    on_progress(len(response.content))
+                return len(response.content)
+            except RemoteFileChanged:
+                raise
+            except (requests.RequestException, IOError) as e:
+                if attempt == self.max_attempts:
+                    raise
+                print(f"Segment {index} failed ({e}), retrying")
+                time.sleep(2 ** (attempt - 1))
+
+    def download_stream(self, url, destination, on_progress=None):
+        """
+        Download a file in a single streamed request, for servers without Range support
+        """
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with open(destination, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=MB):
+                    f.write(chunk)
+                    if on_progress:
+                        on_progress(len(chunk))
+
+    def download(self, url, destination, sha256=None, on_progress=None):
+        """
+        Download a file, resuming a previous partial download of the same file
+        Args:
+            url (str): URL of the file
+            destination (str): local path of the downloaded file
+            sha256 (str): expected SHA-256 hex digest. Only the size is verified if None
+            on_progress (callable): called with the number of bytes received, e.g. a tqdm update
+        Returns:
+            path of the downloaded file
+        """
+        part_path = f"{destination}.part"
+        state_path = f"{destination}.part.json"
+        state = self.read_state(state_path, url, self.segment_size)
+        resumed = (state is not None and state.get('size') and is_strong_validator(state.get('etag'))
+                   and os.path.exists(part_path) and os.path.getsize(part_path) == state['size'])
+        if resumed:
+            # The sidecar already knows the file: If-Range catches a change without another HEAD request
+            size, etag, accepts_ranges = state['size'], state['etag'], True
+            completed = set(state.get('completed', []))
+        else:
+            size, etag, accepts_ranges = self.probe(url)
+        if not accepts_ranges or not size:
+            print(f"{url} does not support Range requests, downloading in a single stream")
+            self.download_stream(url, part_path, on_progress)
+        else:
+            if not resumed:
+                completed = self.load_state(state_path, url, size, etag, self.segment_size)
+            if not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+                completed = set()
+                with open(part_path, 'wb') as f:
+                    f.truncate(size)
+            n_segments = (size + self.segment_size - 1) // self.segment_size
+            remaining = [i for i in range(n_segments) if i not in completed]
+            if completed:
+                print(f"Resuming {destination}: {len(completed)}/{n_segments} segments already downloaded")
+                if on_progress:
+                    on_progress(sum(min(self.segment_size, size - i * self.segment_size) for i in completed))
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(self.fetch_segment, url, part_path, index, size, on_progress, etag): index
+                    for index in remaining
+                }
+                errors = []
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    with self.state_lock:
+                        completed.add(futures[future])
+                        self.save_state(state_path, url, size, etag, completed)
+            if resumed and any(isinstance(e, RemoteFileChanged) for e in errors):
+                print(f"Remote file changed since the partial download, restarting {url}")
+                os.remove(state_path)
+                return self.download(url, destination, sha256, on_progress)
+            if errors:
+                raise IOError(f"{len(errors)} segments of {url} failed, run again to resume: {errors[0]}")
+
+        self.verify(part_path, size, sha256)
+        os.replace(part_path, destination)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return destination
+
+    @staticmethod
+    def verify(path, size=None, sha256=None):
+        """
+        Verify the size and checksum of a downloaded file
+        Raises:
+            IOError if the file does not match
+        """
+        if size and os.path.getsize(path) != size:
+            raise IOError(f"{path} is {os.path.getsize(path)} bytes, expected {size}")
+        if sha256:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(MB), b''):
+                    digest.update(chunk)
+            if digest.hexdigest() != sha256.lower():
+                os.remove(path)
+                raise IOError(f"{path} checksum mismatch: {digest.hexdigest()} != {sha256}")
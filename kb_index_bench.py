@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+"""
+HNSW index-parameter benchmark for the Knowledge Base vector index.
+
+Builds variants of the index created by BedrockKnowledgeBase.create_vector_index on an OpenSearch
+instance (typically a local stand-in), loads synthetic 1024-dimension vectors and sweeps m,
+ef_construction, ef_search and the vector encoding (fp32, fp16, byte). For every variant it reports
+recall@k against exact nearest neighbours, p50/p99 query latency, index size and build time.
+
+The faiss engine ignores the knn.algo_param.ef_search index setting, so ef_search is passed with every
+query (method_parameters, OpenSearch 2.16 or later) and each build is measured at every ef_search value.
+
+The selected settings can then be used with BedrockKnowledgeBase(index_profile={...}) or added to
+knowledge_base.vector_index_profiles. Bedrock only ingests and queries float vectors, so a byte encoding
+needs BedrockKnowledgeBase(direct_ingest_only=True) and kb_direct_ingest.
+
+Usage:
+    docker run -d -p 9200:9200 -e discovery.type=single-node -e DISABLE_SECURITY_PLUGIN=true \\
+        opensearchproject/opensearch:2
+    python kb_index_bench.py --host localhost --port 9200 --output bench_results.json
+"""
+
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+from opensearchpy.helpers import bulk
+
+from kb_direct_ingest import build_oss_client
+from knowledge_base import build_vector_index_body
+
+
+def synthetic_vectors(n_vectors, n_queries, dimension=1024, n_clusters=64, seed=0):
+    """
+    Generate clustered unit vectors, closer to real embeddings than uniform noise
+    Args:
+        n_vectors (int): number of indexed vectors
+        n_queries (int): number of query vectors
+        dimension (int): vector dimension
+        n_clusters (int): number of clusters the vectors are drawn around
+        seed (int): random seed, for repeatable runs
+    Returns:
+        tuple (vectors, queries) of float32 arrays
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dimension))
+    points = centers[rng.integers(n_clusters, size=n_vectors + n_queries)]
+    points = points + rng.normal(scale=0.5, size=points.shape)
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    points = points.astype(np.float32)
+    return points[:n_vectors], points[n_vectors:]
+
+
+def encode(vectors, encoding):
+    """
+    Convert unit vectors to what an index with the given encoding stores: byte indexes take integers
+    in [-128, 127], other encodings take floats (fp16 quantization happens inside the engine)
+    """
+    if encoding == "byte":
+        return np.clip(np.round(vectors * 127), -128, 127).astype(np.int8)
+    return vectors
+
+
+def exact_neighbours(vectors, queries, k):
+    """
+    Exact L2 k nearest neighbours, used as ground truth for recall
+    Returns:
+        array of shape (n_queries, k) with neighbour ids
+    """
+    distances = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def recall_at_k(found, expected):
+    """
+    Average fraction of the exact neighbours returned by the approximate search
+    """
+    return float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)]))
+
+
+def build_index(oss_client, index_name, vectors, m, ef_construction, encoding, bulk_chunk_size=500):
+    """
+    Create an index variant and load the vectors into it
+    Returns:
+        tuple (build seconds, index size in bytes)
+    """
+    if oss_client.indices.exists(index=index_name):
+        oss_client.indices.delete(index=index_name)
+    body = build_vector_index_body(dimension=vectors.shape[1], m=m, ef_construction=ef_construction,
+                                   encoding=encoding)
+    start = time.time()
+    oss_client.indices.create(index=index_name, body=body)
+    stored = encode(vectors, encoding)
+    actions = (
+        {"_index": index_name, "_id": str(i), "_source": {"vector": vector.tolist(), "text": str(i)}}
+        for i, vector in enumerate(stored)
+    )
+    bulk(oss_client, actions, chunk_size=bulk_chunk_size)
+    oss_client.indices.refresh(index=index_name)
+    # Merge segments so the graph is built once, as it would be for a long-lived index
+    oss_client.indices.forcemerge(index=index_name, max_num_segments=1)
+    build_seconds = time.time() - start
+    stats = oss_client.indices.stats(index=index_name, metric="store")
+    size_bytes = stats["indices"][index_name]["total"]["store"]["size_in_bytes"]
+    return build_seconds, size_bytes
+
+
+def run_queries(oss_client, index_name, queries, encoding, k, ef_search=None):
+    """
+    Run the queries one at a time
+    Args:
+        ef_search (int): HNSW candidate list size of these queries. The index's own value if None
+    Returns:
+        tuple (found neighbour ids, latencies in milliseconds)
+    """
+    found = []
+    latencies = []
+    for query in encode(queries, encoding):
+        knn = {"vector": query.tolist(), "k": k}
+        if ef_search is not None:
+            knn["method_parameters"] = {"ef_search": ef_search}
+        body = {"size": k, "_source": False, "query": {"knn": {"vector": knn}}}
+        start = time.perf_counter()
+        response = oss_client.search(index=index_name, body=body)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append([int(hit["_id"]) for hit in response["hits"]["hits"]])
+    return found, latencies
+
+
+def run_benchmark(oss_client, m_values, ef_construction_values, ef_search_values, encodings,
+                  n_vectors=20000, n_queries=200, k=10, dimension=1024, index_prefix="kb-bench"):
+    """
+    Sweep index settings and measure every variant
+    Returns:
+        list of result dicts, one per (m, ef_construction, encoding, ef_search) combination
+    """
+    vectors, queries = synthetic_vectors(n_vectors, n_queries, dimension)
+    expected = exact_neighbours(vectors, queries, k)
+    results = []
+    for m, ef_construction, encoding in itertools.product(m_values, ef_construction_values, encodings):
+        index_name = f"{index_prefix}-m{m}-efc{ef_construction}-{encoding}"
+        print(f"Building {index_name} with {n_vectors} vectors")
+        build_seconds, size_bytes = build_index(oss_client, index_name, vectors, m, ef_construction, encoding)
+        for ef_search in ef_search_values:
+            # Warm up the graph so the first query does not pay for loading it
+            run_queries(oss_client, index_name, queries[:10], encoding, k, ef_search)
+            found, latencies = run_queries(oss_client, index_name, queries, encoding, k, ef_search)
+            result = {
+                "m": m,
+                "ef_construction": ef_construction,
+                "ef_search": ef_search,
+                "encoding": encoding,
+                f"recall@{k}": recall_at_k(found, expected),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "index_size_mb": size_bytes / (1024 * 1024),
+                "build_seconds": build_seconds,
+            }
+            print(json.dumps(result))
+            results.append(result)
+        oss_client.indices.delete(index=index_name)
+    return results
+
+
+def print_table(results):
+    """
+    Print benchmark results as an aligned table
+    """
+    if not results:
+        return
+    columns = list(results[0])
+    widths = [max(len(c), 10) for c in columns]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for result in results:
+        cells = [f"{result[c]:.3f}" if isinstance(result[c], float) else str(result[c]) for c in columns]
+        print("  ".join(cell.rjust(w) for cell, w in zip(cells, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HNSW settings of the Knowledge Base vector index")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--m', type=int, nargs='+', default=[16, 32])
+    parser.add_argument('--ef-construction', type=int, nargs='+', default=[128, 512])
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[64, 128, 512])
+    parser.add_argument('--encoding', nargs='+', default=["fp32", "fp16", "byte"])
+    parser.add_argument('--vectors', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        build_oss_client(args.host, args.port),
+        args.m, args.ef_construction, args.ef_search, args.encoding,
+        n_vectors=args.vectors, n_queries=args.queries, k=args.k,
+    )
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+"""
+Content-hash manifest used for incremental Knowledge Base ingestion.
+
+The manifest is a local JSON file recording, for every document already uploaded to the Knowledge Base
+bucket, its SHA-256 digest and size. Comparing a local folder with the manifest tells which documents are
+new, changed or deleted, so only those are uploaded and (re-)embedded.
+
+The Knowledge Base data source is a Custom Data Source: documents are added to and removed from the vector
+index through the ingest / delete document APIs, not by syncing the bucket. sync_custom_data_source applies
+a manifest diff that way.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from kb_uploader import BulkUploader
+
+# The ingest and delete document APIs of a Custom Data Source accept at most 10 documents per call
+DOCUMENTS_PER_CALL = 10
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 digest of a file
+    Args:
+        path (str): path of the file
+        chunk_size (int): number of bytes read at a time
+    Returns:
+        hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def document_identifier(key):
+    """
+    Build the custom document identifier used for a document in a Custom Data Source
+    Args:
+        key (str): S3 key (file name) of the document
+    Returns:
+        lower-case file name without extension, with whitespace and dashes collapsed to a single dash
+    """
+    clean_filename = re.sub(r'[\s-]+', '-', os.path.basename(key))
+    return os.path.splitext(clean_filename)[0].lower()
+
+
+def build_custom_documents(s3_bucket, keys):
+    """
+    Build the ingest_knowledge_base_documents payload of S3 documents for a Custom Data Source
+    Args:
+        s3_bucket (str): bucket holding the documents
+        keys (iterable): S3 keys of the documents
+    Returns:
+        list of document dicts
+    """
+    documents = []
+    for key in keys:
+        s3_uri = f's3://{s3_bucket}/{key}'
+        custom_document_identifier = document_identifier(key)
+        print(f'{s3_uri} -> Custom Document Identifier: "{custom_document_identifier}"')
+        documents.append(
+            {
+                'content': {
+                    'custom': {
+                        'customDocumentIdentifier': {
+                            'id': custom_document_identifier
+                        },
+                        's3Location': {
+                            'uri': s3_uri
+                        },
+                        'sourceType': 'S3_LOCATION'
+                    },
+                    'dataSourceType': 'CUSTOM'
+                }
+            }
+        )
+    return documents
+
+
+class IngestionManifest:
+    """
+    Local manifest of the documents already present in a Knowledge Base bucket
+    """
+    def __init__(self, path, bucket_name):
+        """
+        Class initializer. Loads the manifest if it exists. A manifest recorded for another bucket is ignored
+        Args:
+            path (str): path of the manifest JSON file
+            bucket_name (str): name of the bucket the documents are uploaded to
+        """
+        self.path = path
+        self.bucket_name = bucket_name
+        self.documents = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('bucket') == bucket_name:
+                self.documents = data.get('documents', {})
+            else:
+                print(f"Manifest {path} was recorded for bucket {data.get('bucket')}, starting from scratch")
+
+    @staticmethod
+    def scan(folder, suffixes=None):
+        """
+        Hash the documents in a folder
+        Args:
+            folder (str): folder containing the documents
+            suffixes (tuple): only include files ending with one of these suffixes. Include all files if None
+        Returns:
+            dict mapping the S3 key of every document to its digest, size and local path
+        Raises:
+            NotADirectoryError: if folder is not an existing directory. An empty scan would mark every
+            document of the manifest as deleted
+        """
+        if not os.path.isdir(folder):
+            raise NotADirectoryError(f"Document folder {folder} does not exist")
+        documents = {}
+        for root, dirs, files in os.walk(folder):
+            for file in files:
+                if file == '.DS_Store' or (suffixes and not file.endswith(tuple(suffixes))):
+                    continue
+                path = os.path.join(root, file)
+                key = os.path.relpath(path, folder).replace(os.sep, '/')
+                documents[key] = {'sha256': file_sha256(path), 'size': os.path.getsize(path), 'path': path}
+        return documents
+
+    def diff(self, folder, suffixes=None):
+        """
+        Compare a local folder with the manifest
+        Args:
+            folder (str): folder containing the documents
+            suffixes (tuple): only include files ending with one of these suffixes
+        Returns:
+            tuple (added, changed, deleted): dicts of scanned documents for added and changed keys,
+            and a list of keys present in the manifest but no longer in the folder
+        """
+        local = self.scan(folder, suffixes)
+        added = {k: v for k, v in local.items() if k not in self.documents}
+        changed = {k: v for k, v in local.items() if k in self.documents and self.documents[k]['sha256'] != v['sha256']}
+        deleted = sorted(k for k in self.documents if k not in local)
+        return added, changed, deleted
+
+    def record(self, key, document):
+        """
+        Record a document as uploaded
+        Args:
+            key (str): S3 key of the document
+            document (dict): scanned document, as returned by scan
+        """
+        self.documents[key] = {'sha256': document['sha256'], 'size': document['size']}
+
+    def forget(self, key):
+        """
+        Remove a deleted document from the manifest
+        Args:
+            key (str): S3 key of the document
+        """
+        self.documents.pop(key, None)
+
+    def save(self):
+        """
+        Write the manifest to disk atomically
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'bucket': self.bucket_name, 'documents': self.documents}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def sync_custom_data_source(bedrock_agent_client, s3_client, knowledge_base_id, data_source_id, s3_bucket,
+                            folder, manifest_path, suffixes=None, max_workers=16):
+    """
+    Bring a Custom Data Source up to date with a local folder, using a content-hash manifest
+    New and changed documents are uploaded to the bucket and ingested, deleted documents are removed from
+    the Knowledge Base and the bucket, DOCUMENTS_PER_CALL documents at a time. The manifest records every
+    batch that went through, so a failed run resumes where it stopped
+    Args:
+        bedrock_agent_client: boto3 bedrock-agent client
+        s3_client: boto3 S3 client
+        knowledge_base_id (str): id of the Knowledge Base
+        data_source_id (str): id of its Custom Data Source
+        s3_bucket (str): bucket holding the documents
+        folder (str): local folder holding the documents
+        manifest_path (str): path of the content-hash manifest
+        suffixes (tuple): only include files ending with one of these suffixes
+        max_workers (int): number of files uploaded at the same time
+    Returns:
+        list of ingest_knowledge_base_documents responses, empty if nothing changed
+    Raises:
+        NotADirectoryError: if folder is not an existing directory
+    """
+    manifest = IngestionManifest(manifest_path, s3_bucket)
+    added, changed, deleted = manifest.diff(folder, suffixes)
+    print(f'Incremental ingestion: {len(added)} new, {len(changed)} changed, {len(deleted)} deleted documents')
+    if not (added or changed or deleted):
+        print('Knowledge Base is up to date, skipping ingestion')
+        return []
+
+    updated = {**added, **changed}
+    uploader = BulkUploader(s3_client, s3_bucket, max_workers=max_workers, skip_unchanged=False)
+    stats = uploader.upload([(document['path'], key) for key, document in updated.items()])
+    if stats['failed']:
+        raise RuntimeError(f"{stats['failed']} documents failed to upload")
+
+    responses = []
+    try:
+        keys = list(updated)
+        for i in range(0, len(keys), DOCUMENTS_PER_CALL):
+            batch = keys[i:i + DOCUMENTS_PER_CALL]
+            responses.append(bedrock_agent_client.ingest_knowledge_base_documents(
+                knowledgeBaseId=knowledge_base_id,
+                dataSourceId=data_source_id,
+                documents=build_custom_documents(s3_bucket, batch)
+            ))
+            for key in batch:
+                manifest.record(key, updated[key])
+        for i in range(0, len(deleted), DOCUMENTS_PER_CALL):
+            batch = deleted[i:i + DOCUMENTS_PER_CALL]
+            bedrock_agent_client.delete_knowledge_base_documents(
+                knowledgeBaseId=knowledge_base_id,
+                dataSourceId=data_source_id,
+                documentIdentifiers=[
+                    {'dataSourceType': 'CUSTOM', 'custom': {'id': document_identifier(key)}} for key in batch
+                ]
+            )
+            s3_client.delete_objects(
+                Bucket=s3_bucket,
+                Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+            )
+            for key in batch:
+                manifest.forget(key)
+    finally:
+        manifest.save()
+    return responses
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+Parallel bulk uploader used to stage Knowledge Base documents in S3.
+
+Files are uploaded by a bounded pool of worker threads, each using a multipart TransferConfig for large
+files. Objects whose size and ETag already match the local file are skipped, and the uploader reports its
+throughput in files/s and MB/s.
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+MB = 1024 * 1024
+
+# Small documents dominate Knowledge Base corpora: parallelism comes from the worker pool, while the
+# multipart settings only kick in for the occasional large file
+DEFAULT_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * MB,
+    multipart_chunksize=16 * MB,
+    max_concurrency=4,
+    use_threads=True,
+)
+
+
+def local_etag(path, transfer_config=DEFAULT_TRANSFER_CONFIG):
+    """
+    Compute the ETag S3 assigns to a file uploaded with the given transfer configuration
+    Args:
+        path (str): path of the file
+        transfer_config (TransferConfig): configuration the file is uploaded with
+    Returns:
+        MD5 hex digest for single part uploads, or MD5 of the part digests suffixed with the part count
+        for multipart uploads
+    """
+    size = os.path.getsize(path)
+    chunk_size = transfer_config.multipart_chunksize
+    with open(path, 'rb') as f:
+        if size < transfer_config.multipart_threshold:
+            return hashlib.md5(f.read()).hexdigest()
+        part_digests = [hashlib.md5(chunk).digest() for chunk in iter(lambda: f.read(chunk_size), b'')]
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+class BulkUploader:
+    """
+    Support class that uploads many files to an S3 bucket concurrently
+    """
+    def __init__(self, s3_client, bucket_name, max_workers=16, transfer_config=DEFAULT_TRANSFER_CONFIG,
+                 skip_unchanged=True):
+        """
+        Class initializer
+        Args:
+            s3_client: boto3 S3 client. Its max_pool_connections should be at least max_workers
+            bucket_name (str): destination bucket
+            max_workers (int): number of files uploaded at the same time
+            transfer_config (TransferConfig): multipart configuration used for every file
+            skip_unchanged (bool): skip files whose size and ETag match the existing object
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers
+        self.transfer_config = transfer_config
+        self.skip_unchanged = skip_unchanged
+
+    def is_unchanged(self, path, key):
+        """
+        Check whether the object already in the bucket matches the local file
+        Args:
+            path (str): local file
+            key (str): S3 key
+        Returns:
+            True if the object exists with the same size and ETag
+        """
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        if head['ContentLength'] != os.path.getsize(path):
+            return False
+        return head['ETag'].strip('"') == local_etag(path, self.transfer_config)
+
+    def upload_file(self, path, key):
+        """
+        Upload a single file unless it is unchanged
+        Args:
+            path (str): local file
+            key (str): S3 key
+        Returns:
+            number of bytes uploaded, or None if the file was skipped
+        """
+        if self.skip_unchanged and self.is_unchanged(path, key):
+            return None
+        self.s3_client.upload_file(path, self.bucket_name, key, Config=self.transfer_config)
+        return os.path.getsize(path)
+
+    def upload(self, files):
+        """
+        Upload files concurrently
+        Args:
+            files (list): (local path, S3 key) tuples
+        Returns:
+            dict with uploaded/skipped/failed file counts, bytes uploaded, elapsed seconds, files/s and MB/s
+        """
+        stats = {'uploaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.upload_file, path, key): path for path, key in files}
+            for future in as_completed(futures):
+                try:
+                    uploaded_bytes = future.result()
+                except Exception as e:
+                    print(f"Error uploading {futures[future]}: {e}")
+                    stats['failed'] += 1
+                    continue
+                if uploaded_bytes is None:
+                    stats['skipped'] += 1
+                else:
+                    stats['uploaded'] += 1
+                    stats['bytes'] += uploaded_bytes
+        elapsed = max(time.time() - start, 1e-6)
+        stats['seconds'] = elapsed
+        stats['files_per_second'] = (stats['uploaded'] + stats['skipped']) / elapsed
+        stats['mb_per_second'] = stats['bytes'] / MB / elapsed
+        print(f"Uploaded {stats['uploaded']} files ({stats['bytes'] / MB:.1f} MB), skipped {stats['skipped']} "
+              f"unchanged, {stats['failed']} failed to {self.bucket_name} in {elapsed:.1f}s: "
+              f"{stats['files_per_second']:.1f} files/s, {stats['mb_per_second']:.1f} MB/s")
+        return stats
+
+    def upload_directory(self, path):
+        """
+        Upload every file of a directory tree, using the file name as S3 key
+        Args:
+            path (str): local directory
+        Returns:
+            upload statistics, see upload
+        """
+        files = []
+        for root, dirs, filenames in os.walk(path):
+            for file in filenames:
+                if file == ".DS_Store":
+                    continue
+                files.append((os.path.join(root, file), file))
+        return self.upload(files)
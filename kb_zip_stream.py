@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+"""
+Streaming download -> unzip -> upload pipeline for bootstrapping Knowledge Base datasets.
+
+Instead of downloading the archive to disk, extracting it and uploading the extracted files, the archive
+is read remotely through HTTP Range requests with a small bounded block cache, and every member is
+streamed straight into an S3 (multipart) upload. The zip central directory lives at the end of the
+archive, so random access is needed to list members: servers without Range support fall back to a
+spooled temporary file which only touches the disk for large archives.
+"""
+
+import io
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+
+import requests
+
+from kb_uploader import DEFAULT_TRANSFER_CONFIG, MB
+
+
+def normalize_member_name(name):
+    """
+    Normalize a zip member name the same way extract_zip_file does
+    Args:
+        name (str): member name in the archive
+    Returns:
+        lower-case name with whitespace and dashes collapsed to a single dash,
+        or None for macOS metadata entries that should be skipped
+    """
+    if name.startswith('__') or '.DS_Store' in name:
+        return None
+    return re.sub(r'[\s-]+', '-', name).lower()
+
+
+class HttpRangeFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over an HTTP resource, backed by Range requests.
+    Recently read blocks are kept in a bounded LRU cache
+    """
+    def __init__(self, url, session=None, block_size=4 * MB, max_blocks=8):
+        """
+        Class initializer
+        Args:
+            url (str): URL of the resource. The server must support Range requests
+            session (requests.Session): session used for the requests, sharing its connection pool
+            block_size (int): number of bytes fetched per request
+            max_blocks (int): number of blocks kept in memory
+        """
+        super().__init__()
+        self.url = url
+        self.session = session or requests.Session()
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()
+        self.position = 0
+        self.lock = threading.Lock()
+        response = self.session.head(url, allow_redirects=True)
+        response.raise_for_status()
+        if response.headers.get('accept-ranges', '').lower() != 'bytes':
+            raise ValueError(f"{url} does not support Range requests")
+        self.size = int(response.headers['content-length'])
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        return self.position
+
+    def _block(self, index):
+        if index in self.blocks:
+            self.blocks.move_to_end(index)
+            return self.blocks[index]
+        start = index * self.block_size
+        end = min(start + self.block_size, self.size) - 1
+        response = self.session.get(self.url, headers={'Range': f'bytes={start}-{end}'})
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise ValueError(f"{self.url} ignored the Range request (HTTP {response.status_code})")
+        self.blocks[index] = response.content
+        if len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+        return self.blocks[index]
+
+    def readinto(self, buffer):
+        with self.lock:
+            count = 0
+            while count < len(buffer) and self.position < self.size:
+                index, offset = divmod(self.position, self.block_size)
+                data = self._block(index)[offset:offset + len(buffer) - count]
+                buffer[count:count + len(data)] = data
+                count += len(data)
+                self.position += len(data)
+            return count
+
+
+def open_remote_zip(url, session=None, spool_max_size=64 * MB):
+    """
+    Open a remote zip archive without downloading it to disk first
+    Args:
+        url (str): URL of the archive
+        session (requests.Session): session used for the requests
+        spool_max_size (int): archives larger than this are spooled to disk when Range is not supported
+    Returns:
+        zipfile.ZipFile
+    """
+    session = session or requests.Session()
+    try:
+        return zipfile.ZipFile(HttpRangeFile(url, session=session))
+    except ValueError as e:
+        print(f"{e}, spooling the archive instead")
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+    with session.get(url, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=MB):
+            spool.write(chunk)
+    spool.seek(0)
+    return zipfile.ZipFile(spool)
+
+
+def stream_zip_to_s3(url, s3_client, bucket_name, max_workers=8, queue_size=16,
+                     transfer_config=DEFAULT_TRANSFER_CONFIG, session=None):
+    """
+    Stream every member of a remote zip archive into an S3 bucket, without staging it on local disk.
+    Members are named like extract_zip_file + upload_directory would: normalized, keyed by file name
+    Args:
+        url (str): URL of the archive
+        s3_client: boto3 S3 client. Its max_pool_connections should be at least max_workers
+        bucket_name (str): destination bucket
+        max_workers (int): number of members uploaded at the same time
+        queue_size (int): maximum number of members waiting for an upload worker
+        transfer_config (TransferConfig): multipart configuration used for every member
+        session (requests.Session): session used for the HTTP requests
+    Returns:
+        list of the S3 keys uploaded
+    """
+    start = time.time()
+    archive = open_remote_zip(url, session=session)
+    work = queue.Queue(maxsize=queue_size)
+    uploaded = []
+    errors = []
+    stats_lock = threading.Lock()
+    total_bytes = [0]
+
+    def worker():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            info, key = item
+            try:
+                # ZipFile serializes access to the shared underlying file, members can be read concurrently
+                with archive.open(info) as member:
+                    s3_client.upload_fileobj(member, bucket_name, key, Config=transfer_config)
+                with stats_lock:
+                    uploaded.append(key)
+                    total_bytes[0] += info.file_size
+            except Exception as e:
+                print(f"Error streaming {info.filename} to s3://{bucket_name}/{key}: {e}")
+                with stats_lock:
+                    errors.append(info.filename)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max_workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for info in archive.infolist():
+            clean_name = normalize_member_name(info.filename)
+            if clean_name is None or info.is_dir():
+                print(f'Skipping file: {info.filename}')
+                continue
+            work.put((info, os.path.basename(clean_name)))
+    finally:
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        archive.close()
+
+    elapsed = max(time.time() - start, 1e-6)
+    print(f"Streamed {len(uploaded)} files ({total_bytes[0] / MB:.1f} MB) from {url} to {bucket_name} "
+          f"in {elapsed:.1f}s: {len(uploaded) / elapsed:.1f} files/s, {total_bytes[0] / MB / elapsed:.1f} MB/s")
+    if errors:
+        raise RuntimeError(f"{len(errors)} archive members failed to upload: {errors}")
+    return uploaded
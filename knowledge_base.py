@@ -6,21 +6,56 @@
 # Changes:
 # - updated "amazon.titan-embed-text-v1" to "amazon.titan-embed-text-v2:0"
 # - updated VectorDB dimension from 1536 to 1024
+# - independent provisioning steps run concurrently, readiness probes replace fixed sleeps
+# - optional incremental ingestion driven by a local content-hash manifest
+# - selectable HNSW profile, fp16/byte vector encodings and Titan v2 reduced dimensions
 
 import json
 import boto3
+import random
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from botocore.exceptions import ClientError
-from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth, RequestError
+from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth, RequestError, AuthorizationException
 import pprint
 from retrying import retry
 
+from kb_direct_ingest import BedrockEmbedder, DirectIngestor, load_documents
+from kb_manifest import sync_custom_data_source
+
 valid_embedding_models = [
     "cohere.embed-multilingual-v3",
     "cohere.embed-english-v3",
     "amazon.titan-embed-text-v2:0"
 ]
+# Output dimensions supported by each embedding model. Titan v2 reduced dimensions shrink the index
+# 2x (512) or 4x (256) on top of any vector encoding
+embedding_model_dimensions = {
+    "cohere.embed-multilingual-v3": [1024],
+    "cohere.embed-english-v3": [1024],
+    "amazon.titan-embed-text-v2:0": [256, 512, 1024],
+}
+# HNSW index profiles selectable through BedrockKnowledgeBase(index_profile=...).
+# None keeps the engine default. Measure candidates with kb_index_bench.py before picking one
+vector_index_profiles = {
+    # Original settings of this sample
+    "default": {"m": None, "ef_construction": None, "ef_search": 512, "encoding": "fp32"},
+    # Smaller query-time search for lower latency, at a small recall cost
+    "low_latency": {"m": 16, "ef_construction": 256, "ef_search": 128, "encoding": "fp32"},
+    # Denser graph and wider search for the best recall
+    "high_recall": {"m": 32, "ef_construction": 512, "ef_search": 512, "encoding": "fp32"},
+    # Half the vector memory through the faiss fp16 scalar quantizer
+    "compact": {"m": 16, "ef_construction": 256, "ef_search": 256, "encoding": "fp16"},
+}
+vector_encodings = ["fp32", "fp16", "byte"]
+# ValidationException messages of create_knowledge_base while the KB role and the OSS data access
+# policy propagate: the role cannot be assumed yet, or the index cannot be reached with it
+PROPAGATION_ERROR_PATTERN = re.compile(r"\brole\b|\bindex\b|security_exception|403|not authorized|permission",
+                                       re.IGNORECASE)
 pp = pprint.PrettyPrinter(indent=2)
+# Timing of every readiness wait performed by wait_until, in the order they completed
+waiter_timings = []
 
 
 def interactive_sleep(seconds: int):
@@ -36,6 +71,179 @@ def interactive_sleep(seconds: int):
         time.sleep(1)
 
 
+def is_propagation_error(exception):
+    """
+    Tell whether a create_knowledge_base error is one that goes away once IAM and AOSS permissions have
+    propagated. Everything else (invalid parameters, access denied, throttling limits) fails at once
+    """
+    if not isinstance(exception, ClientError):
+        return False
+    error = exception.response.get("Error", {})
+    return (error.get("Code") == "ValidationException"
+            and PROPAGATION_ERROR_PATTERN.search(error.get("Message", "")) is not None)
+
+
+def wait_until(probe, description, timeout=900, initial_delay=1, max_delay=30, jitter=0.5):
+    """
+    Poll a readiness probe until it returns a truthy value, sleeping with jittered exponential backoff
+    between attempts. Replaces fixed worst-case sleeps: the wait ends as soon as the resource is ready
+    Args:
+        probe (callable): function without arguments returning a truthy value once the resource is ready
+        description (str): what is being waited for, used in timing output and errors
+        timeout (int): deadline in seconds
+        initial_delay (float): delay in seconds after the first unsuccessful probe
+        max_delay (float): upper bound for the delay between probes
+        jitter (float): fraction of the delay randomly added or removed to spread out concurrent pollers
+    Returns:
+        the first truthy value returned by the probe
+    """
+    start = time.time()
+    deadline = start + timeout
+    delay = initial_delay
+    attempts = 0
+    while True:
+        attempts += 1
+        result = probe()
+        elapsed = time.time() - start
+        if result:
+            waiter_timings.append({"description": description, "seconds": elapsed, "attempts": attempts})
+            print(f"{description}: ready after {elapsed:.1f}s ({attempts} probes)")
+            return result
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError(f"Timed out after {timeout}s waiting for {description}")
+        time.sleep(min(delay * random.uniform(1 - jitter, 1 + jitter), max_delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+
+def build_vector_index_body(dimension=1024, m=None, ef_construction=None, ef_search=512, encoding="fp32"):
+    """
+    Build the OpenSearch knn index definition used by the Knowledge Base
+    Args:
+        dimension (int): vector dimension
+        m (int): HNSW graph degree. Engine default if None
+        ef_construction (int): HNSW candidate list size at build time. Engine default if None
+        ef_search (int): HNSW candidate list size at query time. faiss reads it from the method parameters,
+            the knn.algo_param.ef_search index setting only applies to nmslib
+        encoding (str): "fp32" full precision vectors, "fp16" faiss scalar quantizer or "byte" vectors
+    Returns:
+        index body
+    """
+    if encoding not in vector_encodings:
+        raise ValueError(f"Invalid vector encoding {encoding}. Your encoding should be one of {vector_encodings}")
+    method = {
+        "name": "hnsw",
+        "engine": "faiss",
+        "space_type": "l2"
+    }
+    parameters = {"ef_search": ef_search}
+    if m is not None:
+        parameters["m"] = m
+    if ef_construction is not None:
+        parameters["ef_construction"] = ef_construction
+    if encoding == "fp16":
+        parameters["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+    method["parameters"] = parameters
+    vector_field = {
+        "type": "knn_vector",
+        "dimension": dimension,  # Previously 1536 for amazon.titan-embed-text-v1
+        "method": method,
+    }
+    if encoding == "byte":
+        vector_field["data_type"] = "byte"
+    return {
+        "settings": {
+            "index.knn": "true",
+            "number_of_shards": 1,
+            "knn.algo_param.ef_search": ef_search,
+            "number_of_replicas": 0,
+        },
+        "mappings": {
+            "properties": {
+                "vector": vector_field,
+                "text": {
+                    "type": "text"
+                },
+                "text-metadata": {
+                    "type": "text"}
+            }
+        }
+    }
+
+
+class ProvisioningPipeline:
+    """
+    Support class that runs provisioning steps concurrently. Each step is started as soon as all the
+    steps it depends on have completed, so independent resources are created at the same time
+    """
+    def __init__(self, max_workers=4):
+        """
+        Class initializer
+        Args:
+            max_workers (int): maximum number of steps running at the same time
+        """
+        self.max_workers = max_workers
+        self.steps = {}
+        self.timings = {}
+
+    def add_step(self, name, func, depends_on=None, description=None):
+        """
+        Register a provisioning step
+        Args:
+            name (str): unique step name, used by other steps to declare dependencies
+            func (callable): function without arguments performing the step
+            depends_on (list): names of the steps that must complete before this one starts
+            description (str): message printed when the step starts
+        """
+        if name in self.steps:
+            raise ValueError(f"Step {name} is already registered")
+        self.steps[name] = {
+            "func": func,
+            "depends_on": list(depends_on or []),
+            "description": description or name,
+        }
+
+    def run(self):
+        """
+        Run all registered steps, respecting their dependencies
+        Returns:
+            dict with the return value of every step, keyed by step name
+        """
+        for name, step in self.steps.items():
+            unknown = [d for d in step["depends_on"] if d not in self.steps]
+            if unknown:
+                raise ValueError(f"Step {name} depends on unknown steps {unknown}")
+
+        results = {}
+        pending = dict(self.steps)
+        running = {}
+        started = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [name for name, step in pending.items() if all(d in results for d in step["depends_on"])]
+                for name in ready:
+                    step = pending.pop(name)
+                    print("========================================================================================")
+                    print(step["description"])
+                    started[name] = time.time()
+                    running[executor.submit(step["func"])] = name
+                if not running:
+                    raise ValueError(f"Steps {list(pending)} have circular dependencies")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    self.timings[name] = time.time() - started[name]
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        print(f"Step {name} failed after {self.timings[name]:.1f}s")
+                        raise
+                    print(f"Step {name} completed in {self.timings[name]:.1f}s")
+        return results
+
+
 class BedrockKnowledgeBase:
     """
     Support class that allows for:
@@ -49,7 +257,12 @@ class BedrockKnowledgeBase:
             kb_name,
             kb_description=None,
             data_bucket_name=None,
-            embedding_model="amazon.titan-embed-text-v2:0"
+            embedding_model="amazon.titan-embed-text-v2:0",
+            parallel_provisioning=True,
+            index_profile="default",
+            embedding_dimensions=1024,
+            vector_encoding=None,
+            direct_ingest_only=False
     ):
         """
         Class initializer
@@ -58,6 +271,16 @@ class BedrockKnowledgeBase:
             kb_description (str): knowledge base description
             data_bucket_name (str): name of s3 bucket to connect with knowledge base
             embedding_model (str): embedding model to use
+            parallel_provisioning (bool): create independent resources concurrently
+            index_profile (str or dict): name of a vector_index_profiles entry, or a dict with the
+                m, ef_construction, ef_search and encoding HNSW settings of the vector index
+            embedding_dimensions (int): embedding and vector index dimension, see embedding_model_dimensions
+            vector_encoding (str): "fp32", "fp16" (faiss scalar quantizer, half the vector memory) or "byte"
+                (a quarter of the memory). Overrides the encoding of the index profile. "byte" requires
+                direct_ingest_only
+            direct_ingest_only (bool): documents only go through ingest_documents_directly and the index is
+                queried by the caller, not through Bedrock. Bedrock ingestion and retrieval use float vectors,
+                so this is the only way to use a byte index. start_ingestion_job is disabled
         """
         boto3_session = boto3.session.Session()
         self.region_name = boto3_session.region_name
@@ -81,6 +304,24 @@ class BedrockKnowledgeBase:
             valid_embeddings_str = str(valid_embedding_models)
             raise ValueError(f"Invalid embedding model. Your embedding model should be one of {valid_embeddings_str}")
         self.embedding_model = embedding_model
+        if isinstance(index_profile, str):
+            if index_profile not in vector_index_profiles:
+                raise ValueError(f"Invalid index profile. Your index profile should be one of "
+                                 f"{list(vector_index_profiles)}")
+            index_profile = vector_index_profiles[index_profile]
+        self.index_profile = {**vector_index_profiles["default"], **index_profile}
+        if vector_encoding is not None:
+            self.index_profile["encoding"] = vector_encoding
+        if self.index_profile["encoding"] not in vector_encodings:
+            raise ValueError(f"Invalid vector encoding. Your vector encoding should be one of {vector_encodings}")
+        if self.index_profile["encoding"] == "byte" and not direct_ingest_only:
+            raise ValueError("The byte vector encoding cannot be ingested or queried by Bedrock: "
+                             "use it with direct_ingest_only=True, or use fp32 / fp16")
+        self.direct_ingest_only = direct_ingest_only
+        if embedding_dimensions not in embedding_model_dimensions[embedding_model]:
+            raise ValueError(f"Invalid embedding dimensions {embedding_dimensions} for {embedding_model}. "
+                             f"Your dimensions should be one of {embedding_model_dimensions[embedding_model]}")
+        self.embedding_dimensions = embedding_dimensions
         self.encryption_policy_name = f"bedrock-sample-rag-sp-{self.suffix}"
         self.network_policy_name = f"bedrock-sample-rag-np-{self.suffix}"
         self.access_policy_name = f'bedrock-sample-rag-ap-{self.suffix}'
@@ -91,34 +332,73 @@ class BedrockKnowledgeBase:
 
         self.vector_store_name = f'bedrock-sample-rag-{self.suffix}'
         self.index_name = f"bedrock-sample-rag-index-{self.suffix}"
-        print("========================================================================================")
-        print(f"Step 1 - Creating or retrieving {self.bucket_name} S3 bucket for Knowledge Base documents")
-        self.create_s3_bucket()
-        print("========================================================================================")
-        print(f"Step 2 - Creating Knowledge Base Execution Role ({self.kb_execution_role_name}) and Policies")
-        self.bedrock_kb_execution_role = self.create_bedrock_kb_execution_role()
-        print("========================================================================================")
-        print(f"Step 3 - Creating OSS encryption, network and data access policies")
-        self.encryption_policy, self.network_policy, self.access_policy = self.create_policies_in_oss()
-        print("========================================================================================")
-        print(f"Step 4 - Creating OSS Collection (this step takes a couple of minutes to complete)")
-        self.host, self.collection, self.collection_id, self.collection_arn = self.create_oss()
-        # Build the OpenSearch client
-        self.oss_client = OpenSearch(
-            hosts=[{'host': self.host, 'port': 443}],
-            http_auth=self.awsauth,
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection,
-            timeout=300
+        self.provisioning_timings = self.provision(parallel=parallel_provisioning)
+
+    def provision(self, parallel=True):
+        """
+        Create (or retrieve) the S3 bucket, IAM role, OSS policies, collection, vector index and Knowledge Base.
+        Steps that do not depend on each other run concurrently
+        Args:
+            parallel (bool): run independent steps concurrently. If False, steps run one at a time
+        Returns:
+            dict with the wall time in seconds spent on every step
+        """
+        def build_oss_client():
+            self.host, self.collection, self.collection_id, self.collection_arn = self.create_oss()
+            # Build the OpenSearch client
+            self.oss_client = OpenSearch(
+                hosts=[{'host': self.host, 'port': 443}],
+                http_auth=self.awsauth,
+                use_ssl=True,
+                verify_certs=True,
+                connection_class=RequestsHttpConnection,
+                timeout=300
+            )
+
+        def create_execution_role():
+            self.bedrock_kb_execution_role = self.create_bedrock_kb_execution_role()
+
+        def create_security_policies():
+            self.encryption_policy, self.network_policy = self.create_security_policies_in_oss()
+
+        def create_access_policy():
+            self.access_policy = self.create_access_policy_in_oss()
+
+        def create_knowledge_base():
+            self.knowledge_base, self.data_source = self.create_knowledge_base()
+
+        pipeline = ProvisioningPipeline(max_workers=4 if parallel else 1)
+        pipeline.add_step(
+            "s3_bucket", self.create_s3_bucket,
+            description=f"Step 1 - Creating or retrieving {self.bucket_name} S3 bucket for Knowledge Base documents"
         )
+        pipeline.add_step(
+            "execution_role", create_execution_role,
+            description=f"Step 2 - Creating Knowledge Base Execution Role ({self.kb_execution_role_name}) and Policies"
+        )
+        pipeline.add_step(
+            "oss_security_policies", create_security_policies,
+            description="Step 3a - Creating OSS encryption and network policies"
+        )
+        pipeline.add_step(
+            "oss_access_policy", create_access_policy, depends_on=["execution_role"],
+            description="Step 3b - Creating OSS data access policy"
+        )
+        pipeline.add_step(
+            "oss_collection", build_oss_client, depends_on=["oss_security_policies", "execution_role"],
+            description="Step 4 - Creating OSS Collection (this step takes a couple of minutes to complete)"
+        )
+        pipeline.add_step(
+            "vector_index", self.create_vector_index, depends_on=["oss_collection", "oss_access_policy"],
+            description="Step 5 - Creating OSS Vector Index"
+        )
+        pipeline.add_step(
+            "knowledge_base", create_knowledge_base, depends_on=["vector_index", "s3_bucket"],
+            description="Step 6 - Creating Knowledge Base"
+        )
+        pipeline.run()
         print("========================================================================================")
-        print(f"Step 5 - Creating OSS Vector Index")
-        self.create_vector_index()
-        print("========================================================================================")
-        print(f"Step 6 - Creating Knowledge Base")
-        self.knowledge_base, self.data_source = self.create_knowledge_base()
-        print("========================================================================================")
+        return pipeline.timings
 
     def create_s3_bucket(self):
         """
@@ -288,6 +568,15 @@ class BedrockKnowledgeBase:
         Create OpenSearch Serverless encryption, network and data access policies.
         If policies already exist, retrieve them
         """
+        encryption_policy, network_policy = self.create_security_policies_in_oss()
+        access_policy = self.create_access_policy_in_oss()
+        return encryption_policy, network_policy, access_policy
+
+    def create_security_policies_in_oss(self):
+        """
+        Create OpenSearch Serverless encryption and network policies.
+        If policies already exist, retrieve them
+        """
         try:
             encryption_policy = self.aoss_client.create_security_policy(
                 name=self.encryption_policy_name,
@@ -321,7 +610,13 @@ class BedrockKnowledgeBase:
                 name=self.network_policy_name,
                 type='network'
             )
+        return encryption_policy, network_policy
 
+    def create_access_policy_in_oss(self):
+        """
+        Create OpenSearch Serverless data access policy for the current identity and the Knowledge Base
+        Execution role. If policy already exists, retrieve it
+        """
         try:
             access_policy = self.aoss_client.create_access_policy(
                 name=self.access_policy_name,
@@ -359,8 +654,7 @@ class BedrockKnowledgeBase:
                 name=self.access_policy_name,
                 type='data'
             )
-
-        return encryption_policy, network_policy, access_policy
+        return access_policy
 
     def create_oss(self):
         """
@@ -382,21 +676,20 @@ class BedrockKnowledgeBase:
         print(host)
         # wait for collection creation
         # This can take couple of minutes to finish
-        response = self.aoss_client.batch_get_collection(names=[self.vector_store_name])
-        # Periodically check collection status
-        while (response['collectionDetails'][0]['status']) == 'CREATING':
-            print('Creating collection...')
-            interactive_sleep(30)
-            response = self.aoss_client.batch_get_collection(names=[self.vector_store_name])
+        def collection_ready():
+            details = self.aoss_client.batch_get_collection(names=[self.vector_store_name])['collectionDetails']
+            if details[0]['status'] == 'FAILED':
+                raise RuntimeError(f"Collection {self.vector_store_name} creation failed")
+            return details if details[0]['status'] == 'ACTIVE' else None
+
+        details = wait_until(collection_ready, f"Collection {self.vector_store_name} ACTIVE", initial_delay=5)
         print('\nCollection successfully created:')
-        pp.pprint(response["collectionDetails"])
-        # create opensearch serverless access policy and attach it to Bedrock execution role
+        pp.pprint(details)
+        # create opensearch serverless access policy and attach it to Bedrock execution role.
+        # Data access rules can take up to a minute to be enforced: create_vector_index probes for it,
+        # and create_knowledge_base retries until the role can use the collection
         try:
-            created = self.create_oss_policy_attach_bedrock_execution_role(collection_id)
-            if created:
-                # It can take up to a minute for data access rules to be enforced
-                print("Sleeping for a minute to ensure data access rules have been enforced")
-                interactive_sleep(60)
+            self.create_oss_policy_attach_bedrock_execution_role(collection_id)
             return host, collection, collection_id, collection_arn
         except Exception as e:
             print("Policy already exists")
@@ -406,41 +699,24 @@ class BedrockKnowledgeBase:
         """
         Create OpenSearch Serverless vector index. If existent, ignore
         """
-        body_json = {
-            "settings": {
-                "index.knn": "true",
-                "number_of_shards": 1,
-                "knn.algo_param.ef_search": 512,
-                "number_of_replicas": 0,
-            },
-            "mappings": {
-                "properties": {
-                    "vector": {
-                        "type": "knn_vector",
-                        "dimension": 1024,  # Previously 1536 for amazon.titan-embed-text-v1
-                        "method": {
-                            "name": "hnsw",
-                            "engine": "faiss",
-                            "space_type": "l2"
-                        },
-                    },
-                    "text": {
-                        "type": "text"
-                    },
-                    "text-metadata": {
-                        "type": "text"}
-                }
-            }
-        }
+        body_json = build_vector_index_body(dimension=self.embedding_dimensions, **self.index_profile)
+
+        def create_index():
+            try:
+                return self.oss_client.indices.create(index=self.index_name, body=json.dumps(body_json))
+            except AuthorizationException:
+                # data access policy not enforced yet, the index creation doubles as a probe write
+                return None
 
         # Create index
         try:
-            response = self.oss_client.indices.create(index=self.index_name, body=json.dumps(body_json))
+            response = wait_until(create_index, f"Data access policy {self.access_policy_name} enforced")
             print('\nCreating index:')
             pp.pprint(response)
 
             # index creation can take up to a minute
-            interactive_sleep(60)
+            wait_until(lambda: self.oss_client.indices.exists(index=self.index_name),
+                       f"Index {self.index_name} available")
         except RequestError as e:
             # you can delete the index if its already exists
             # oss_client.indices.delete(index=index_name)
@@ -448,7 +724,8 @@ class BedrockKnowledgeBase:
                 f'Error while trying to create the index, with error {e.error}\nyou may unmark the delete above to '
                 f'delete, and recreate the index')
 
-    @retry(wait_random_min=1000, wait_random_max=2000, stop_max_attempt_number=7)
+    @retry(retry_on_exception=is_propagation_error, wait_exponential_multiplier=1000, wait_exponential_max=15000,
+           stop_max_delay=180000)
     def create_knowledge_base(self):
         """
         Create Knowledge Base and its Data Source. If existent, retrieve
@@ -480,6 +757,14 @@ class BedrockKnowledgeBase:
 
         # The embedding model used by Bedrock to embed ingested documents, and realtime prompts
         embedding_model_arn = f"arn:aws:bedrock:{self.region_name}::foundation-model/{self.embedding_model}"
+        embedding_model_configuration = {}
+        if len(embedding_model_dimensions[self.embedding_model]) > 1:
+            # Models with several output sizes must be told which one matches the vector index
+            embedding_model_configuration["embeddingModelConfiguration"] = {
+                "bedrockEmbeddingModelConfiguration": {
+                    "dimensions": self.embedding_dimensions
+                }
+            }
         try:
             create_kb_response = self.bedrock_agent_client.create_knowledge_base(
                 name=self.kb_name,
@@ -488,7 +773,8 @@ class BedrockKnowledgeBase:
                 knowledgeBaseConfiguration={
                     "type": "VECTOR",
                     "vectorKnowledgeBaseConfiguration": {
-                        "embeddingModelArn": embedding_model_arn
+                        "embeddingModelArn": embedding_model_arn,
+                        **embedding_model_configuration
                     }
                 },
                 storageConfiguration={
@@ -540,10 +826,27 @@ class BedrockKnowledgeBase:
             pp.pprint(ds)
         return kb, ds
 
-    def start_ingestion_job(self):
+    def start_ingestion_job(self, folder=None, manifest_path=None):
         """
-        Start an ingestion job to synchronize data from an S3 bucket to the Knowledge Base
+        Start an ingestion job to synchronize data from an S3 bucket to the Knowledge Base.
+        When a local folder and a manifest are given, the Custom Data Source is synchronized with the folder
+        instead, through the ingest / delete document APIs (see kb_manifest.sync_custom_data_source): a data
+        source sync does not pick up bucket changes for a Custom Data Source
+        Args:
+            folder (str): local folder holding the documents of the Knowledge Base
+            manifest_path (str): path of the content-hash manifest of the documents already ingested
+        Returns:
+            the completed ingestion job, or the ingest_knowledge_base_documents responses of an incremental
+            synchronization
         """
+        if self.direct_ingest_only:
+            raise RuntimeError("This Knowledge Base is direct-ingest only: use ingest_documents_directly")
+        if folder is not None and manifest_path is not None:
+            return sync_custom_data_source(
+                self.bedrock_agent_client, self.s3_client, self.knowledge_base['knowledgeBaseId'],
+                self.data_source["dataSourceId"], self.bucket_name, folder, manifest_path
+            )
+
         # Start an ingestion job
         start_job_response = self.bedrock_agent_client.start_ingestion_job(
             knowledgeBaseId=self.knowledge_base['knowledgeBaseId'],
@@ -551,16 +854,49 @@ class BedrockKnowledgeBase:
         )
         job = start_job_response["ingestionJob"]
         pp.pprint(job)
-        # Get job
-        while job['status'] != 'COMPLETE':
-            get_job_response = self.bedrock_agent_client.get_ingestion_job(
+        return self.wait_for_ingestion_job(job["ingestionJobId"])
+
+    def wait_for_ingestion_job(self, ingestion_job_id):
+        """
+        Wait for an ingestion job to complete, then for the indexed documents to be searchable
+        Args:
+            ingestion_job_id (str): id of the ingestion job
+        Returns:
+            the completed ingestion job
+        """
+        def job_complete():
+            job = self.bedrock_agent_client.get_ingestion_job(
                 knowledgeBaseId=self.knowledge_base['knowledgeBaseId'],
                 dataSourceId=self.data_source["dataSourceId"],
-                ingestionJobId=job["ingestionJobId"]
-            )
-            job = get_job_response["ingestionJob"]
+                ingestionJobId=ingestion_job_id
+            )["ingestionJob"]
+            if job['status'] in ('FAILED', 'STOPPED'):
+                raise RuntimeError(f"Ingestion job {ingestion_job_id} ended with status {job['status']}")
+            return job if job['status'] == 'COMPLETE' else None
+
+        job = wait_until(job_complete, f"Ingestion job {ingestion_job_id} COMPLETE", initial_delay=2)
         pp.pprint(job)
-        interactive_sleep(40)
+        if job.get('statistics', {}).get('numberOfNewDocumentsIndexed', 0):
+            wait_until(lambda: self.oss_client.count(index=self.index_name)['count'] > 0,
+                       f"Index {self.index_name} searchable", timeout=120)
+        return job
+
+    def ingest_documents_directly(self, folder, embedder=None, **kwargs):
+        """
+        Chunk, embed and bulk-index the documents of a local folder straight into the vector index,
+        bypassing the managed ingestion job. Meant for large backfills
+        Args:
+            folder (str): local folder holding the documents
+            embedder: object with an embed(texts) method. Defaults to the Knowledge Base embedding model
+            kwargs: DirectIngestor tuning options (embed_batch_size, chunk_size, thread_count, ...)
+        Returns:
+            ingestion statistics
+        """
+        if embedder is None:
+            embedder = BedrockEmbedder(self.embedding_model, dimension=self.embedding_dimensions)
+        ingestor = DirectIngestor(self.oss_client, self.index_name, embedder,
+                                  vector_encoding=self.index_profile["encoding"], **kwargs)
+        return ingestor.ingest(load_documents(folder))
 
     def get_knowledge_base_id(self):
         """
@@ -585,69 +921,144 @@ class BedrockKnowledgeBase:
 
     def delete_kb(self, delete_s3_bucket=False, delete_iam_roles_and_policies=True):
         """
-        Delete the Knowledge Base resources
+        Delete the Knowledge Base resources. Independent resources are deleted concurrently, and each
+        deletion waits for the actual deletion state of the resources it depends on
         Args:
             delete_s3_bucket (bool): boolean to indicate if s3 bucket should also be deleted
             delete_iam_roles_and_policies (bool): boolean to indicate if IAM roles and Policies should also be deleted
+        Returns:
+            dict with the wall time in seconds spent on every step
         """
-        self.bedrock_agent_client.delete_data_source(
-            dataSourceId=self.data_source["dataSourceId"],
-            knowledgeBaseId=self.knowledge_base['knowledgeBaseId']
-        )
-        self.bedrock_agent_client.delete_knowledge_base(
-            knowledgeBaseId=self.knowledge_base['knowledgeBaseId']
-        )
-        self.oss_client.indices.delete(index=self.index_name)
-        self.aoss_client.delete_collection(id=self.collection_id)
-        self.aoss_client.delete_access_policy(
-            type="data",
-            name=self.access_policy_name
-        )
-        self.aoss_client.delete_security_policy(
-            type="network",
-            name=self.network_policy_name
-        )
-        self.aoss_client.delete_security_policy(
-            type="encryption",
-            name=self.encryption_policy_name
-        )
+        kb_id = self.knowledge_base['knowledgeBaseId']
+        ds_id = self.data_source["dataSourceId"]
+
+        not_found = self.bedrock_agent_client.exceptions.ResourceNotFoundException
+
+        def gone(get_resource, name):
+            """Probe true once the resource no longer exists, raising when its deletion failed"""
+            def probe():
+                try:
+                    resource = get_resource()
+                except not_found:
+                    return True
+                if resource['status'] == 'DELETE_UNSUCCESSFUL':
+                    reasons = "; ".join(resource.get('failureReasons', [])) or "no reason given"
+                    raise RuntimeError(f"{name} deletion failed: {reasons}")
+                return False
+            return probe
+
+        def delete_data_source():
+            self.bedrock_agent_client.delete_data_source(dataSourceId=ds_id, knowledgeBaseId=kb_id)
+            wait_until(gone(lambda: self.bedrock_agent_client.get_data_source(
+                                dataSourceId=ds_id, knowledgeBaseId=kb_id)['dataSource'],
+                            f"Data Source {ds_id}"),
+                       f"Data Source {ds_id} deleted")
+
+        def delete_knowledge_base():
+            self.bedrock_agent_client.delete_knowledge_base(knowledgeBaseId=kb_id)
+            wait_until(gone(lambda: self.bedrock_agent_client.get_knowledge_base(knowledgeBaseId=kb_id)['knowledgeBase'],
+                            f"Knowledge Base {kb_id}"),
+                       f"Knowledge Base {kb_id} deleted")
+
+        def collection_gone():
+            details = self.aoss_client.batch_get_collection(ids=[self.collection_id])['collectionDetails']
+            if not details:
+                return True
+            if details[0]['status'] == 'FAILED':
+                raise RuntimeError(f"Collection {self.vector_store_name} deletion failed")
+            return False
+
+        def delete_collection():
+            self.aoss_client.delete_collection(id=self.collection_id)
+            wait_until(collection_gone, f"Collection {self.collection_id} deleted", initial_delay=5)
+
+        def delete_oss_policies():
+            # Policies can only be removed once no collection references them
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [
+                    executor.submit(self.aoss_client.delete_access_policy, type="data", name=self.access_policy_name),
+                    executor.submit(self.aoss_client.delete_security_policy, type="network",
+                                    name=self.network_policy_name),
+                    executor.submit(self.aoss_client.delete_security_policy, type="encryption",
+                                    name=self.encryption_policy_name),
+                ]
+                for future in futures:
+                    future.result()
+
+        pipeline = ProvisioningPipeline(max_workers=4)
+        pipeline.add_step("data_source", delete_data_source, description=f"Deleting Data Source {ds_id}")
+        pipeline.add_step("knowledge_base", delete_knowledge_base, depends_on=["data_source"],
+                          description=f"Deleting Knowledge Base {kb_id}")
+        # The data source deletion removes its vectors from the index, so the index must outlive it
+        pipeline.add_step("vector_index", lambda: self.oss_client.indices.delete(index=self.index_name),
+                          depends_on=["data_source"], description=f"Deleting OSS Vector Index {self.index_name}")
+        pipeline.add_step("oss_collection", delete_collection, depends_on=["vector_index", "knowledge_base"],
+                          description=f"Deleting OSS Collection {self.vector_store_name}")
+        pipeline.add_step("oss_policies", delete_oss_policies, depends_on=["oss_collection"],
+                          description="Deleting OSS encryption, network and data access policies")
         if delete_s3_bucket:
-            self.delete_s3()
+            pipeline.add_step("s3_bucket", self.delete_s3, description=f"Deleting S3 bucket {self.bucket_name}")
         if delete_iam_roles_and_policies:
-            self.delete_iam_roles_and_policies()
+            pipeline.add_step("iam", self.delete_iam_roles_and_policies, depends_on=["knowledge_base"],
+                              description=f"Deleting Knowledge Base Execution Role ({self.kb_execution_role_name}) "
+                                          f"and Policies")
+        pipeline.run()
+        return pipeline.timings
 
     def delete_iam_roles_and_policies(self):
         """
         Delete IAM Roles and policies used by the Knowledge Base
         """
-        fm_policy_arn = f"arn:aws:iam::{self.account_number}:policy/{self.fm_policy_name}"
-        s3_policy_arn = f"arn:aws:iam::{self.account_number}:policy/{self.s3_policy_name}"
-        oss_policy_arn = f"arn:aws:iam::{self.account_number}:policy/{self.oss_policy_name}"
-        self.iam_client.detach_role_policy(
-            RoleName=self.kb_execution_role_name,
-            PolicyArn=s3_policy_arn
-        )
-        self.iam_client.detach_role_policy(
-            RoleName=self.kb_execution_role_name,
-            PolicyArn=fm_policy_arn
-        )
-        self.iam_client.detach_role_policy(
-            RoleName=self.kb_execution_role_name,
-            PolicyArn=oss_policy_arn
-        )
-        self.iam_client.delete_role(RoleName=self.kb_execution_role_name)
-        self.iam_client.delete_policy(PolicyArn=s3_policy_arn)
-        self.iam_client.delete_policy(PolicyArn=fm_policy_arn)
-        self.iam_client.delete_policy(PolicyArn=oss_policy_arn)
+        policy_arns = [
+            f"arn:aws:iam::{self.account_number}:policy/{policy_name}"
+            for policy_name in (self.s3_policy_name, self.fm_policy_name, self.oss_policy_name)
+        ]
+        with ThreadPoolExecutor(max_workers=len(policy_arns) + 1) as executor:
+            # Policies must be detached before the role and the policies themselves can be deleted
+            list(executor.map(
+                lambda policy_arn: self.iam_client.detach_role_policy(
+                    RoleName=self.kb_execution_role_name,
+                    PolicyArn=policy_arn
+                ),
+                policy_arns
+            ))
+            futures = [executor.submit(self.iam_client.delete_role, RoleName=self.kb_execution_role_name)]
+            futures += [executor.submit(self.iam_client.delete_policy, PolicyArn=arn) for arn in policy_arns]
+            for future in futures:
+                future.result()
         return 0
 
-    def delete_s3(self):
+    def delete_s3(self, max_workers=8):
         """
-        Delete the objects contained in the Knowledge Base S3 bucket.
+        Delete the objects contained in the Knowledge Base S3 bucket, including all object versions and
+        delete markers, in batches of 1,000 keys deleted concurrently.
         Once the bucket is empty, delete the bucket
+        Args:
+            max_workers (int): number of delete_objects calls in flight
         """
-        objects = self.s3_client.list_objects(Bucket=self.bucket_name)
-        if 'Contents' in objects:
-            for obj in objects['Contents']:
-                self.s3_client.delete_object(Bucket=self.bucket_name, Key=obj['Key'])
+        def delete_batch(objects):
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': objects, 'Quiet': True}
+            )
+            for error in response.get('Errors', []):
+                print(f"Error deleting {error['Key']}: {error['Message']}")
+            return len(objects) - len(response.get('Errors', []))
+
+        def batches():
+            batch = []
+            paginator = self.s3_client.get_paginator('list_object_versions')
+            for page in paginator.paginate(Bucket=self.bucket_name):
+                for version in page.get('Versions', []) + page.get('DeleteMarkers', []):
+                    batch.append({'Key': version['Key'], 'VersionId': version['VersionId']})
+                    if len(batch) == 1000:
+                        yield batch
+                        batch = []
+            if batch:
+                yield batch
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            deleted = sum(executor.map(delete_batch, batches()))
+        print(f"Deleted {deleted} objects from {self.bucket_name}")
         self.s3_client.delete_bucket(Bucket=self.bucket_name)
+        self.s3_client.get_waiter('bucket_not_exists').wait(Bucket=self.bucket_name)
@@ -0,0 +1,306 @@
+"""
+Local low-latency query router for the TeachAssist Streamlit apps.
+
+determine_action and run_kb_agent each spend a full LLM round trip to get back one word. This router
+decides between "teacher", "store" and "retrieve" in a single pass, well under a millisecond:
+
+1. High-precision keyword rules catch the obvious cases.
+2. A small multinomial logistic regression over word and shape features scores everything else. It
+   is trained offline from the examples of ACTION_SYSTEM_PROMPT / KB_ACTION_SYSTEM_PROMPT (plus a few
+   more of the same kind), and its weights ship in query_router_weights.json.
+
+The model is only trusted on queries that look like its training data: with so few examples it is
+confidently wrong about everything else ("What is your name?" is not a recall question). When too few
+of a query's words and word pairs were seen in training, or the model is not confident enough, the
+decision is left to the LLM. The router keeps count of how often it answered locally (its hit rate)
+and with which confidence.
+
+After changing the rules, the features or the examples, retrain with:
+    python query_router.py
+which refuses to write the weights unless every training example routes to its own label.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter, namedtuple
+
+LABELS = ("teacher", "store", "retrieve")
+
+# (query, label) pairs: the examples of the routing prompts, plus a few more of the same kind
+TRAINING_EXAMPLES = [
+    ("What is the capital of France?", "teacher"),
+    ("How do I solve this equation: 2x + 5 = 15?", "teacher"),
+    ("Translate 'hello' to Spanish", "teacher"),
+    ("Explain photosynthesis", "teacher"),
+    ("What is a binary search tree?", "teacher"),
+    ("Write a Python function to reverse a list", "teacher"),
+    ("Fix the grammar in this sentence: she go to school", "teacher"),
+    ("Solve x^2 + 5x + 6 = 0", "teacher"),
+    ("What is 15% of 80?", "teacher"),
+    ("Who wrote Pride and Prejudice?", "teacher"),
+    ("How does a for loop work in Java?", "teacher"),
+    ("Summarize the causes of World War I", "teacher"),
+    ("What does 'bonjour' mean in English?", "teacher"),
+    ("Calculate the area of a circle with radius 3", "teacher"),
+    ("Tell me about black holes", "teacher"),
+    ("Can you help me understand fractions?", "teacher"),
+    ("How do plants grow?", "teacher"),
+    ("Can you write a short poem about autumn", "teacher"),
+    ("How do I reverse a list in Python?", "teacher"),
+    ("Where can I learn about black holes?", "teacher"),
+    ("I need help with my homework on fractions", "teacher"),
+    ("How can I improve my essay?", "teacher"),
+    ("I don't understand long division", "teacher"),
+    ("Remember that my birthday is July 4", "store"),
+    ("My favorite color is blue", "store"),
+    ("The capital of France is Paris", "store"),
+    ("My name is John", "store"),
+    ("I live in Seattle", "store"),
+    ("Remember my dog is called Max", "store"),
+    ("Note that my exam is on Friday", "store"),
+    ("I am allergic to peanuts", "store"),
+    ("My teacher's name is Mrs. Smith", "store"),
+    ("I work at a hospital", "store"),
+    ("Save this: my locker code is 4312", "store"),
+    ("I like playing chess", "store"),
+    ("What's my birthday?", "retrieve"),
+    ("What is my favorite color?", "retrieve"),
+    ("Who am I?", "retrieve"),
+    ("Where do I live?", "retrieve"),
+    ("What is my name?", "retrieve"),
+    ("When is my exam?", "retrieve"),
+    ("What is my dog called?", "retrieve"),
+    ("Do you remember my locker code?", "retrieve"),
+    ("What am I allergic to?", "retrieve"),
+    ("Where do I work?", "retrieve"),
+    ("What do you know about me?", "retrieve"),
+    ("What did I tell you about my teacher?", "retrieve"),
+]
+
+# High-precision rules, checked in order before the model
+RULES = [
+    (re.compile(r"^(please\s+)?(remember|note|save|store|keep in mind)\b(?!.*\?$)"), "store"),
+    (re.compile(r"^my\s+(favou?rite\s+[a-z]+|name|birthday)\s+(is|are)\b(?!.*\?$)"), "store"),
+    # Recall only: "what's my birthday?", "what did I tell you...", not any question in the first person
+    (re.compile(r"^(what|where|when|who|which)('s|\s+(is|are|was|were))\s+my\b.*\?$"), "retrieve"),
+    (re.compile(r"^(what|when|where)\s+did\s+i\s+(tell|say|mention|share)\b"), "retrieve"),
+    (re.compile(r"^(who am i|what do you (know|remember) about me)\b"), "retrieve"),
+    (re.compile(r"^(do|did) you (remember|know|recall)\b.*\b(my|me|i)\b"), "retrieve"),
+    (re.compile(r"^(translate|solve|calculate|explain|define|summari[sz]e|write|fix|correct)\b"), "teacher"),
+    (re.compile(r"^(tell me about|teach me|help me (understand|with))\b"), "teacher"),
+    (re.compile(r"\b(help (me )?(with|understand|learn)|homework)\b|^(how (do|can|should) i|where can i)\b"), "teacher"),
+    (re.compile(r"\d\s*[-+*/^=]\s*\d|\b\d*x\s*[-+*/^=]"), "teacher"),
+]
+
+WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_router_weights.json")
+
+RouteDecision = namedtuple("RouteDecision", ["action", "kb_action", "label", "confidence", "source"])
+RouteDecision.__doc__ = """
+Routing decision.
+action: "teacher" or "knowledgebase", None when the LLM should decide
+kb_action: "store" or "retrieve" for knowledge base queries, None when the LLM should decide
+label / confidence: most likely label and its probability
+source: "rule" or "model"
+"""
+
+
+def normalize(query):
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+
+def features(query):
+    """Word unigrams and bigrams, plus a few shape features."""
+    text = normalize(query)
+    words = re.findall(r"[a-z']+|\d+|[?=+*/^-]", text)
+    feats = Counter(f"w:{w}" for w in words)
+    feats.update(f"b:{a}_{b}" for a, b in zip(words, words[1:]))
+    if words:
+        feats[f"first:{words[0]}"] += 1
+    if text.endswith("?"):
+        feats["shape:question"] += 1
+    if re.search(r"\b(my|i|me|i'm|mine)\b", text):
+        feats["shape:first_person"] += 1
+    if re.search(r"\d", text):
+        feats["shape:digit"] += 1
+    feats["bias"] += 1
+    return feats
+
+
+def coverage_features(feats):
+    """Features that say what a query is about: its words and word pairs."""
+    return [feat for feat in feats if feat.startswith(("w:", "b:"))]
+
+
+def examples_fingerprint(examples):
+    """Hash of the training examples, to tell whether saved weights were trained on them."""
+    return hashlib.sha256(json.dumps(list(examples)).encode()).hexdigest()
+
+
+class QueryRouter:
+    """
+    Rules plus a linear model deciding teacher / store / retrieve, with an LLM fallback threshold
+    """
+    def __init__(self, weights=None, threshold=0.75, min_coverage=0.75):
+        """
+        Args:
+            weights (dict): model weights per label and feature, e.g. from train or load
+            threshold (float): confidence below which the decision is left to the LLM
+            min_coverage (float): share of a query's words and word pairs that must have been seen in
+                training for the model to decide. The LLM decides queries unlike the training examples
+        """
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self.weights = weights or {label: {} for label in LABELS}
+        self._lock = threading.Lock()
+        self._stats = Counter()
+        self._confidence_sum = 0.0
+
+    @classmethod
+    def train(cls, examples=TRAINING_EXAMPLES, epochs=300, learning_rate=0.5, l2=1e-3, **kwargs):
+        """Train the model by stochastic gradient descent. Takes about a second: run it offline."""
+        router = cls(**kwargs)
+        data = [(features(query), label) for query, label in examples]
+        for _ in range(epochs):
+            for feats, label in data:
+                probabilities = router.probabilities(feats)
+                for candidate in LABELS:
+                    gradient = probabilities[candidate] - (1.0 if candidate == label else 0.0)
+                    weights = router.weights[candidate]
+                    for feat, value in feats.items():
+                        w = weights.get(feat, 0.0)
+                        weights[feat] = w - learning_rate * (gradient * value + l2 * w)
+        return router
+
+    def save(self, path=WEIGHTS_PATH, examples=TRAINING_EXAMPLES):
+        weights = {label: {f: round(w, 6) for f, w in sorted(self.weights[label].items()) if abs(w) >= 1e-6}
+                   for label in LABELS}
+        with open(path, "w") as f:
+            json.dump({"examples": examples_fingerprint(examples), "weights": weights}, f, indent=1)
+            f.write("\n")
+
+    @classmethod
+    def load(cls, path=WEIGHTS_PATH, examples=TRAINING_EXAMPLES, **kwargs):
+        """
+        Router with the weights shipped in path
+        Falls back to training at start-up, with a warning, when the file is missing or was trained on
+        other examples.
+        """
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            if saved["examples"] == examples_fingerprint(examples):
+                return cls(saved["weights"], **kwargs)
+            print(f"Query router weights in {path} are stale: training at start-up, run python query_router.py")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load query router weights from {path} ({e}): training at start-up")
+        return cls.train(examples, **kwargs)
+
+    def coverage(self, feats):
+        """Share of the words and word pairs of a query that the model saw in training."""
+        feats = coverage_features(feats)
+        if not feats:
+            return 0.0
+        return sum(1 for feat in feats if any(feat in self.weights[label] for label in LABELS)) / len(feats)
+
+    def probabilities(self, feats):
+        scores = {label: sum(self.weights[label].get(f, 0.0) * v for f, v in feats.items()) for label in LABELS}
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+    def route(self, query):
+        """
+        Decide how a query should be handled
+        Returns:
+            RouteDecision. action / kb_action are None where the LLM should decide: no rule matched, and
+            the query is unlike the training examples or the confidence is below the threshold
+        """
+        decision = self._decide(query)
+        self._record(decision)
+        return decision
+
+    def _decide(self, query):
+        text = normalize(query)
+        for pattern, label in RULES:
+            if pattern.search(text):
+                probabilities = {candidate: 0.0 for candidate in LABELS}
+                probabilities[label] = 1.0
+                source = "rule"
+                break
+        else:
+            feats = features(query)
+            probabilities = self.probabilities(feats)
+            source = "model"
+        label = max(probabilities, key=probabilities.get)
+        if source == "model" and self.coverage(feats) < self.min_coverage:
+            return RouteDecision(None, None, label, probabilities[label], source)
+
+        p_kb = probabilities["store"] + probabilities["retrieve"]
+        action_confidence = max(probabilities["teacher"], p_kb)
+        action = None
+        if action_confidence >= self.threshold:
+            action = "teacher" if probabilities["teacher"] >= p_kb else "knowledgebase"
+        kb_action = None
+        # Store or retrieve only when the knowledge base is the more likely branch
+        if p_kb > probabilities["teacher"]:
+            kb_label = "store" if probabilities["store"] >= probabilities["retrieve"] else "retrieve"
+            if probabilities[kb_label] / p_kb >= self.threshold:
+                kb_action = kb_label
+        return RouteDecision(action, kb_action, label, probabilities[label], source)
+
+    def misrouted(self, examples=TRAINING_EXAMPLES):
+        """
+        Examples the router does not send to their own label
+        Returns:
+            list of (query, expected label, RouteDecision)
+        """
+        return [(query, label, decision) for query, label in examples
+                for decision in [self._decide(query)] if decision.label != label]
+
+    def _record(self, decision):
+        with self._lock:
+            self._stats["total"] += 1
+            self._stats["local" if decision.action else "fallback"] += 1
+            self._stats[f"source:{decision.source}"] += 1
+            self._confidence_sum += decision.confidence
+
+    def stats(self):
+        """
+        Routing statistics since start-up
+        Returns:
+            dict with total, local and fallback decision counts, hit rate and mean confidence
+        """
+        with self._lock:
+            total = self._stats["total"]
+            return {
+                "total": total,
+                "local": self._stats["local"],
+                "fallback": self._stats["fallback"],
+                "rule": self._stats["source:rule"],
+                "model": self._stats["source:model"],
+                "hit_rate": self._stats["local"] / total if total else 0.0,
+                "mean_confidence": self._confidence_sum / total if total else 0.0,
+            }
+
+
+# Process-wide router shared by every session
+query_router = QueryRouter.load()
+
+
+if __name__ == "__main__":
+    # Retrain offline and ship the weights, only when every example routes to its own label
+    router = QueryRouter.train()
+    errors = router.misrouted()
+    for query, expected, decision in errors:
+        print(f"Misrouted: {query!r} expected {expected}, got {decision.label} ({decision.source}, "
+              f"{decision.confidence:.2f})")
+    if errors:
+        sys.exit(1)
+    router.save()
+    print(f"Routed all {len(TRAINING_EXAMPLES)} examples correctly, weights saved to {WEIGHTS_PATH}")
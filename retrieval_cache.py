@@ -0,0 +1,118 @@
+"""
+Per-user retrieval cache for the TeachAssist Streamlit apps.
+
+run_kb_agent queries the knowledge base on every retrieve-class query, even when the same user asks the
+same question again moments later. This cache keeps recent retrieval results keyed on
+(user, normalized query, retrieval parameters), bounded both in age (TTL) and in size (LRU).
+
+A user's entries are dropped as soon as that user stores new content, so they never read answers
+that predate their own writes. Writes from other users only become visible once the TTL expires.
+"""
+
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from query_router import normalize
+
+
+class RetrievalCache:
+    """LRU cache of retrieval results with a time-to-live and per-user invalidation."""
+    def __init__(self, max_entries=512, ttl_seconds=300):
+        """
+        Args:
+            max_entries (int): maximum number of cached results, least recently used are evicted first
+            ttl_seconds (float): age after which a cached result is retrieved again
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+        # Bumped on every invalidation, so a retrieval that overlapped a store is not cached
+        self._generations = Counter()
+
+    @staticmethod
+    def key(user_id, query, **params):
+        return user_id, normalize(query), tuple(sorted(params.items()))
+
+    def get(self, user_id, query, **params):
+        """Return the cached result, or None when it is missing or expired."""
+        key = self.key(user_id, query, **params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, user_id, query, result, generation=None, **params):
+        key = self.key(user_id, query, **params)
+        with self._lock:
+            if generation is not None and generation != self._generations[user_id]:
+                return
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_or_retrieve(self, user_id, query, retrieve, **params):
+        """
+        Return the cached result for the query, calling retrieve() on a miss
+        Args:
+            user_id (str): user the results belong to
+            query (str): retrieval query
+            retrieve (callable): function running the retrieval
+            **params: retrieval parameters that change the result, e.g. min_score and max_results
+        """
+        result = self.get(user_id, query, **params)
+        if result is None:
+            with self._lock:
+                generation = self._generations[user_id]
+            result = retrieve()
+            # Do not keep failed retrievals around for the whole TTL
+            if not (isinstance(result, dict) and result.get("status") == "error"):
+                self.put(user_id, query, result, generation, **params)
+        return result
+
+    def invalidate_user(self, user_id):
+        """Drop all the cached results of a user, e.g. after they stored new content."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == user_id]
+            for key in stale:
+                del self._entries[key]
+            self._generations[user_id] += 1
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        """
+        Cache statistics since start-up
+        Returns:
+            dict with entry count, hits, misses, hit rate, expirations, evictions and invalidations
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "expired": self._stats["expired"],
+                "evictions": self._stats["evictions"],
+                "invalidations": self._stats["invalidations"],
+            }
+
+
+# Process-wide cache shared by every session, partitioned by user
+retrieval_cache = RetrievalCache(
+    max_entries=int(os.environ.get("RETRIEVAL_CACHE_MAX_ENTRIES", 512)),
+    ttl_seconds=float(os.environ.get("RETRIEVAL_CACHE_TTL_SECONDS", 300)),
+)
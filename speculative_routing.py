@@ -0,0 +1,100 @@
+"""
+Speculative branch execution for the TeachAssist routing flow.
+
+The knowledge base flow is route -> store/retrieve -> retrieve -> answer. Retrieval is cheap compared
+with the LLM hops around it, so it can be started at the same time as routing: if the router picks the
+knowledge base retrieve branch the result is already there (or on its way), and if it picks the teacher
+or the store branch the speculative work is cancelled and its result thrown away.
+
+Threads cannot be interrupted, so cancelling a speculation that already started only discards its
+result. Metrics keep track of both sides of the trade-off: the latency saved on the branches that used
+a speculative result, and the work wasted on the ones that were discarded.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SpeculationMetrics:
+    """Process-wide counters of speculative work used, discarded, saved and wasted."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.discarded = 0
+        self.saved_seconds = 0.0
+        self.wasted_seconds = 0.0
+
+    def record(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "used": self.used,
+                "discarded": self.discarded,
+                "saved_seconds": self.saved_seconds,
+                "wasted_seconds": self.wasted_seconds,
+            }
+
+
+class SpeculativeTask:
+    """A branch started before the router decided whether it is needed."""
+    def __init__(self, executor, fn, metrics):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self.cancelled = False
+        self.started_at = None
+        self.finished_at = None
+        metrics.record(started=1)
+        self.future = executor.submit(self._run, fn)
+
+    def _run(self, fn):
+        with self._lock:
+            if self.cancelled:
+                return None
+            self.started_at = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.finished_at = time.perf_counter()
+                if self.cancelled:
+                    # The branch lost while running: everything it did was wasted
+                    self.metrics.record(wasted_seconds=self.finished_at - self.started_at)
+
+    def result(self, timeout=None):
+        """
+        Use the speculative result, waiting for it if needed. The latency saved is the part of the
+        branch that already ran before the result was needed
+        """
+        needed_at = time.perf_counter()
+        value = self.future.result(timeout=timeout)
+        waited = time.perf_counter() - needed_at
+        duration = self.finished_at - self.started_at
+        self.metrics.record(used=1, saved_seconds=max(duration - waited, 0.0))
+        return value
+
+    def cancel(self):
+        """Discard the branch: it does not start if it is still queued, its result is ignored otherwise."""
+        with self._lock:
+            self.cancelled = True
+            if self.finished_at is not None:
+                # Finished before the router decided: the whole run was wasted
+                self.metrics.record(wasted_seconds=self.finished_at - self.started_at)
+        self.metrics.record(discarded=1)
+        self.future.cancel()
+
+
+# Shared by all sessions: speculative branches are short I/O-bound calls
+speculation_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative")
+speculation_metrics = SpeculationMetrics()
+
+
+def speculate(fn):
+    """Start fn speculatively and return its SpeculativeTask."""
+    return SpeculativeTask(speculation_executor, fn, speculation_metrics)
@@ -0,0 +1,121 @@
+"""
+Process-wide cache of SSM parameters for the TeachAssist Streamlit apps.
+
+Streamlit re-executes the app script on every interaction, so reading configuration from SSM in the
+script means one GetParameter call per click and per session, and SSM throttles under load. Parameters
+are cached here for the whole process:
+- reruns read them from memory
+- a parameter older than refresh_after seconds is refreshed in the background while the cached value
+  keeps being served, so reruns never wait for SSM once a value is known
+- a value older than ttl_seconds is fetched again before it is used
+- only one request per parameter is in flight at a time (single flight): concurrent sessions asking
+  for the same parameter wait for that request instead of sending their own
+
+Missing parameters are cached like values, and failed requests are retried after error_ttl_seconds.
+While SSM is failing, the last known value keeps being served.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+_MISSING = object()
+
+
+class ParameterCache:
+    """SSM parameters with a TTL, background refresh and single-flight requests."""
+    def __init__(self, client, ttl_seconds=900, refresh_after=300, error_ttl_seconds=30):
+        """
+        Args:
+            client: boto3 SSM client
+            ttl_seconds (float): age after which a value must be fetched again before it is used
+            refresh_after (float): age after which a value is refreshed in the background
+            error_ttl_seconds (float): delay before retrying a parameter that could not be read
+        """
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_after = refresh_after
+        self.error_ttl_seconds = error_ttl_seconds
+        self._entries = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ssm-refresh")
+        self.requests = 0
+
+    def _fetch(self, name):
+        """Read a parameter from SSM and store it. Runs at most once at a time per parameter."""
+        try:
+            response = self.client.get_parameter(Name=name, WithDecryption=True)
+            value, expires_in = response['Parameter']['Value'], self.ttl_seconds
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ParameterNotFound':
+                value, expires_in = _MISSING, self.ttl_seconds
+            else:
+                print(f"Could not read SSM parameter {name}: {e}")
+                value, expires_in = None, self.error_ttl_seconds
+        except Exception as e:
+            # No credentials, no network...: same as a failed request
+            print(f"Could not read SSM parameter {name}: {e}")
+            value, expires_in = None, self.error_ttl_seconds
+        with self._lock:
+            previous = self._entries.get(name)
+            if value is None:
+                # Keep serving the last known value while SSM is failing
+                value = previous[1] if previous is not None else _MISSING
+            self._entries[name] = (time.monotonic(), value, expires_in)
+            del self._in_flight[name]
+        return value
+
+    def _request(self, name):
+        """Future of the request for a parameter, started unless one is already in flight. Call with the lock held."""
+        future = self._in_flight.get(name)
+        if future is None:
+            future = self._executor.submit(self._fetch, name)
+            self._in_flight[name] = future
+            self.requests += 1
+        return future
+
+    def get(self, name, default=None):
+        """
+        Return a parameter value, from memory whenever possible
+        Args:
+            name (str): SSM parameter name
+            default: value returned when the parameter does not exist or cannot be read
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                fetched_at, value, expires_in = entry
+                age = time.monotonic() - fetched_at
+                if age < expires_in:
+                    if age >= min(self.refresh_after, expires_in):
+                        self._request(name)
+                    return default if value is _MISSING else value
+            future = self._request(name)
+        value = future.result()
+        return default if value is _MISSING else value
+
+    def invalidate(self, name=None):
+        """Forget one parameter, or all of them, so that the next read goes to SSM."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def parameter_cache(region, **kwargs):
+    """Return the process-wide ParameterCache of a region, creating it on first use."""
+    with _caches_lock:
+        cache = _caches.get(region)
+        if cache is None:
+            cache = ParameterCache(boto3.client('ssm', region_name=region), **kwargs)
+            _caches[region] = cache
+        return cache
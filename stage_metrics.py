@@ -0,0 +1,164 @@
+"""
+Per-stage latency and token instrumentation for the TeachAssist Streamlit apps.
+
+A query goes through several stages: local routing, teacher / knowledge base classification,
+store / retrieve classification, memory retrieval, then the teacher or the answer generation. A
+QueryTrace records for each stage:
+- the wall time
+- the Bedrock latency and the input / output tokens reported by the agent that ran the stage
+
+Agent figures come from the difference of the agent's accumulated event loop metrics before and after
+the stage. Direct tool calls (agent.tool.use_agent, agent.tool.memory) and sub-agents (the teacher's
+specialists) do not show up there, so those stages only have a wall time.
+
+Finished traces go to an in-memory window, which the sidebar panel summarizes, and to a local log for
+offline percentile analysis: JSON lines by default, or an SQLite table when the log path ends in .db
+or .sqlite.
+"""
+
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from strands_multi_agent_example.specialist_pool import agent_usage
+
+STAGE_FIELDS = ("query_id", "app", "timestamp", "stage", "wall_ms", "bedrock_latency_ms", "input_tokens",
+                "output_tokens", "attributes")
+
+
+class StageLog:
+    """Recent stage records in memory, appended to a JSON lines file or an SQLite table."""
+    def __init__(self, path=None, window=2000):
+        """
+        Args:
+            path (str): log file, SQLite when it ends with .db or .sqlite. Nothing is written when None
+            window (int): number of stage records kept in memory for the sidebar panel
+        """
+        self.path = path
+        self.records = deque(maxlen=window)
+        self._lock = threading.Lock()
+        if path and path.endswith((".db", ".sqlite")):
+            with sqlite3.connect(path) as connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS stage_metrics (query_id TEXT, app TEXT, timestamp REAL, stage TEXT, "
+                    "wall_ms REAL, bedrock_latency_ms REAL, input_tokens INTEGER, output_tokens INTEGER, "
+                    "attributes TEXT)"
+                )
+
+    def append(self, records):
+        with self._lock:
+            self.records.extend(records)
+            if not self.path:
+                return
+            try:
+                if self.path.endswith((".db", ".sqlite")):
+                    with sqlite3.connect(self.path) as connection:
+                        connection.executemany(
+                            f"INSERT INTO stage_metrics VALUES ({', '.join('?' * len(STAGE_FIELDS))})",
+                            [tuple(json.dumps(r[f]) if f == "attributes" else r[f] for f in STAGE_FIELDS)
+                             for r in records]
+                        )
+                else:
+                    with open(self.path, "a") as f:
+                        for record in records:
+                            f.write(json.dumps(record) + "\n")
+            except (OSError, sqlite3.Error) as e:
+                print(f"Could not write stage metrics to {self.path}: {e}")
+
+    def last_query(self):
+        """Stage records of the most recent query."""
+        with self._lock:
+            if not self.records:
+                return []
+            query_id = self.records[-1]["query_id"]
+            return [r for r in self.records if r["query_id"] == query_id]
+
+    def summary(self):
+        """
+        Percentiles of the recent records, per stage
+        Returns:
+            list of dicts with stage, count, p50 / p90 wall time and mean tokens
+        """
+        with self._lock:
+            records = list(self.records)
+        by_stage = {}
+        for record in records:
+            by_stage.setdefault(record["stage"], []).append(record)
+        rows = []
+        for stage, stage_records in by_stage.items():
+            walls = sorted(r["wall_ms"] for r in stage_records)
+            rows.append({
+                "stage": stage,
+                "count": len(walls),
+                "p50_ms": round(statistics.median(walls)),
+                "p90_ms": round(walls[min(len(walls) - 1, int(len(walls) * 0.9))]),
+                "mean_tokens_in": round(statistics.mean(r["input_tokens"] for r in stage_records)),
+                "mean_tokens_out": round(statistics.mean(r["output_tokens"] for r in stage_records)),
+            })
+        return rows
+
+
+class QueryTrace:
+    """Stage records of one query."""
+    def __init__(self, app, log):
+        self.query_id = uuid.uuid4().hex
+        self.app = app
+        self.log = log
+        self.records = []
+        self._started_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, agent=None, **attributes):
+        """
+        Record the duration of a block, and the Bedrock usage of agent during it when given
+        Args:
+            name (str): stage name
+            agent: strands Agent running the stage
+            **attributes: extra values logged with the stage, e.g. whether the local router decided
+        """
+        before = agent_usage(agent) if agent is not None else (0, 0, 0)
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            wall_ms = (time.perf_counter() - start) * 1000
+            after = agent_usage(agent) if agent is not None else (0, 0, 0)
+            self._add(name, wall_ms, *(a - b for a, b in zip(after, before)), attributes)
+
+    def _add(self, stage, wall_ms, latency_ms, input_tokens, output_tokens, attributes):
+        with self._lock:
+            self.records.append({
+                "query_id": self.query_id,
+                "app": self.app,
+                "timestamp": time.time(),
+                "stage": stage,
+                "wall_ms": wall_ms,
+                "bedrock_latency_ms": latency_ms,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "attributes": attributes,
+            })
+
+    def finish(self, **attributes):
+        """Record the total for the query and send all its stages to the log."""
+        totals = [sum(r[f] for r in self.records) for f in ("bedrock_latency_ms", "input_tokens", "output_tokens")]
+        self._add("total", (time.perf_counter() - self._started_at) * 1000, *totals, attributes)
+        self.log.append(self.records)
+
+
+def trace_stage(trace, name, agent=None, **attributes):
+    """trace.stage(...) when tracing, and a no-op context otherwise."""
+    if trace is None:
+        return nullcontext(attributes)
+    return trace.stage(name, agent, **attributes)
+
+
+# Process-wide log shared by every session
+stage_log = StageLog(os.environ.get("STAGE_METRICS_LOG", "stage_metrics.jsonl") or None)
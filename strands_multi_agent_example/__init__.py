@@ -0,0 +1,7 @@
+"""
+Teacher's assistant multi-agent example: specialist agents and their routing.
+
+Run the command-line assistant with python teachers_assistant.py from this folder, or
+python -m strands_multi_agent_example.teachers_assistant from the repository root. The Streamlit apps
+import the specialists as strands_multi_agent_example.*.
+"""
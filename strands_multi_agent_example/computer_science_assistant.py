@@ -1,24 +1,17 @@
 from __future__ import annotations
 
-from strands import tool, Agent
-from strands.models import BedrockModel
+from strands import tool
 
-BEDROCK_MODEL_ID = "meta.llama3-8b-instruct-v1:0"
+from .model_cascade import ModelCascade
 
-bedrock_model = BedrockModel(
-    model_id=BEDROCK_MODEL_ID,
-    temperature=0.3,
-    streaming=False,
+CS_SYSTEM_PROMPT = (
+    "You are a computer science assistant. "
+    "You write correct, clean code and explain briefly. "
+    "Do NOT call any tools. Return only text."
 )
 
-cs_agent = Agent(
-    model=bedrock_model,
-    system_prompt=(
-        "You are a computer science assistant. "
-        "You write correct, clean code and explain briefly. "
-        "Do NOT call any tools. Return only text."
-    ),
-)
+# Cheapest model first, escalated to a larger one when the answer looks wrong
+cs_cascade = ModelCascade("computer_science", CS_SYSTEM_PROMPT, callback_handler=None)
 
 
 def _is_palindrome_request(q: str) -> bool:
@@ -43,5 +36,4 @@ def computer_science_assistant(query: str) -> str:
             "```\n"
         )
 
-    resp = cs_agent(query)
-    return str(resp).strip()
+    return cs_cascade(query)
@@ -1,12 +1,9 @@
 from __future__ import annotations
 
 from strands import tool
-from strands import Agent
-from strands.models import BedrockModel
 
+from .model_cascade import ModelCascade
 
-BEDROCK_MODEL_ID = "meta.llama3-8b-instruct-v1:0"
-bedrock_model = BedrockModel(model_id=BEDROCK_MODEL_ID, temperature=0.3, streaming=False)
 
 LANG_SYSTEM_PROMPT = """
 You are a translation assistant.
@@ -15,13 +12,14 @@ If formality matters, provide both informal and formal versions briefly.
 Do NOT call any tools. Return only text.
 """.strip()
 
+# Cheapest model first, escalated to a larger one when the answer looks wrong
+language_cascade = ModelCascade("language", LANG_SYSTEM_PROMPT, callback_handler=None)
+
 
 @tool
 def language_assistant(query: str) -> str:
     print("Routed to Language Assistant")
     try:
-        language_agent = Agent(model=bedrock_model, system_prompt=LANG_SYSTEM_PROMPT, callback_handler=None)
-        resp = language_agent(query)
-        return str(resp).strip()
+        return language_cascade(query)
     except Exception as e:
         return f"Error processing your language query: {str(e)}"
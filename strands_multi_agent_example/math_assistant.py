@@ -2,7 +2,17 @@ from __future__ import annotations
 
 from strands import tool
 import sympy as sp
+import ast
+import multiprocessing
+import os
 import re
+import threading
+from fractions import Fraction
+from functools import lru_cache
+
+# Worker processes for the equations that need a full SymPy solve, and the time each one gets
+MATH_WORKERS = int(os.environ.get("MATH_WORKERS", 2))
+MATH_TIMEOUT_SECONDS = float(os.environ.get("MATH_TIMEOUT_SECONDS", 10))
 
 
 def normalize_expression(expr: str) -> str:
@@ -29,6 +39,157 @@ def normalize_expression(expr: str) -> str:
     return expr
 
 
+class _NotSimplePolynomial(Exception):
+    """The expression is not a polynomial in x of degree 2 or less with rational coefficients."""
+
+
+def _add(p, q):
+    size = max(len(p), len(q))
+    return [(p[i] if i < len(p) else 0) + (q[i] if i < len(q) else 0) for i in range(size)]
+
+
+def _multiply(p, q):
+    if len(p) + len(q) - 2 > 2:
+        raise _NotSimplePolynomial()
+    product = [Fraction(0)] * (len(p) + len(q) - 1)
+    for i, a in enumerate(p):
+        for j, b in enumerate(q):
+            product[i + j] += a * b
+    return product
+
+
+def _coefficients(node):
+    """Coefficients (constant first) of the polynomial an expression AST represents."""
+    if isinstance(node, ast.Expression):
+        return _coefficients(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return [Fraction(node.value)]
+    if isinstance(node, ast.Name) and node.id == "x":
+        return [Fraction(0), Fraction(1)]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        p = _coefficients(node.operand)
+        return [-c for c in p] if isinstance(node.op, ast.USub) else p
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.Pow):
+            exponent = node.right
+            if not (isinstance(exponent, ast.Constant) and type(exponent.value) is int and 0 <= exponent.value <= 2):
+                raise _NotSimplePolynomial()
+            result = [Fraction(1)]
+            for _ in range(exponent.value):
+                result = _multiply(result, _coefficients(node.left))
+            return result
+        p, q = _coefficients(node.left), _coefficients(node.right)
+        if isinstance(node.op, ast.Add):
+            return _add(p, q)
+        if isinstance(node.op, ast.Sub):
+            return _add(p, [-c for c in q])
+        if isinstance(node.op, ast.Mult):
+            return _multiply(p, q)
+        if isinstance(node.op, ast.Div) and len(q) == 1 and q[0] != 0:
+            return [c / q[0] for c in p]
+    raise _NotSimplePolynomial()
+
+
+@lru_cache(maxsize=1024)
+def polynomial_coefficients(expr: str):
+    """
+    Coefficients (constant first) of a normalized expression when it is a polynomial in x of degree
+    2 or less with rational coefficients, None otherwise. Cached on the normalized expression.
+    """
+    try:
+        return tuple(_coefficients(ast.parse(expr.strip(), mode="eval")))
+    except (SyntaxError, _NotSimplePolynomial, RecursionError):
+        return None
+
+
+def solve_simple_polynomial(lhs: str, rhs: str):
+    """
+    Closed-form solve of lhs = rhs for linear and quadratic equations in x, without sympy.solve
+    Returns:
+        tuple (solutions, checks) of strings formatted like the SymPy path, or None when the equation
+        is not linear or quadratic
+    """
+    p, q = polynomial_coefficients(lhs), polynomial_coefficients(rhs)
+    if p is None or q is None:
+        return None
+    c = _add(list(p), [-k for k in q]) + [Fraction(0)] * 2
+    c0, c1, c2 = (sp.Rational(k.numerator, k.denominator) for k in c[:3])
+    if c2 != 0:
+        root = sp.sqrt(c1 ** 2 - 4 * c2 * c0)
+        solutions = [(-c1 - root) / (2 * c2), (-c1 + root) / (2 * c2)]
+        if root == 0:
+            solutions = solutions[:1]
+        elif root.is_real:
+            solutions.sort(key=lambda s: float(s))
+    elif c1 != 0:
+        solutions = [-c0 / c1]
+    else:
+        return None
+    x = sp.Symbol("x")
+    checks = [f"Check at x={s}: {sp.simplify((c2 * x ** 2 + c1 * x + c0).subs(x, s))}" for s in solutions]
+    return [str(s) for s in solutions], checks
+
+
+@lru_cache(maxsize=1024)
+def _sympify(expr: str):
+    """Parsed expression, cached per worker process on the normalized expression."""
+    return sp.sympify(expr)
+
+
+def _solve_with_sympy(lhs: str, rhs: str):
+    """Full SymPy solve, run in a worker process. Returns (solutions, checks) as strings."""
+    x = sp.Symbol("x")
+    lhs_expr = _sympify(lhs)
+    rhs_expr = _sympify(rhs)
+
+    eq = sp.Eq(lhs_expr, rhs_expr)
+    solutions = sp.solve(eq, x)
+
+    checks = []
+    for s in solutions:
+        val = sp.simplify((lhs_expr - rhs_expr).subs(x, s))
+        checks.append(f"Check at x={s}: {val}")
+    return [str(s) for s in solutions], checks
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Warm worker processes, started on first use and kept for the next queries."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs threads (Streamlit, executors) is not safe
+            _pool = multiprocessing.get_context("spawn").Pool(MATH_WORKERS)
+        return _pool
+
+
+def _discard_pool(pool):
+    """Kill the worker processes of a pool, e.g. one stuck on a pathological input."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.terminate()
+
+
+def solve_in_worker(lhs: str, rhs: str, timeout: float = MATH_TIMEOUT_SECONDS):
+    """
+    Solve lhs = rhs with SymPy in a worker process, with a hard time limit
+    Raises:
+        multiprocessing.TimeoutError: when the solve took longer than timeout. The workers are
+            killed and replaced, which also fails the other solves in flight on the same pool
+    """
+    pool = _get_pool()
+    try:
+        return pool.apply_async(_solve_with_sympy, (lhs, rhs)).get(timeout)
+    except multiprocessing.TimeoutError:
+        _discard_pool(pool)
+        raise
+
+
 @tool
 def math_assistant(query: str) -> str:
     """
@@ -60,22 +221,19 @@ def math_assistant(query: str) -> str:
         lhs = normalize_expression(lhs)
         rhs = normalize_expression(rhs)
 
-        x = sp.Symbol("x")
-        lhs_expr = sp.sympify(lhs)
-        rhs_expr = sp.sympify(rhs)
-
-        eq = sp.Eq(lhs_expr, rhs_expr)
-        solutions = sp.solve(eq, x)
+        # Linear and quadratic equations are solved in closed form, anything else by SymPy in a worker
+        solved = solve_simple_polynomial(lhs, rhs)
+        if solved is None:
+            try:
+                solved = solve_in_worker(lhs, rhs)
+            except multiprocessing.TimeoutError:
+                return f"This equation took too long to solve (more than {MATH_TIMEOUT_SECONDS:g}s)."
+        solutions, checks = solved
 
         if not solutions:
             return "No solutions found."
 
-        sol_str = ", ".join(str(s) for s in solutions)
-
-        checks = []
-        for s in solutions:
-            val = sp.simplify(lhs_expr.subs(x, s) - rhs_expr)
-            checks.append(f"Check at x={s}: {val}")
+        sol_str = ", ".join(solutions)
 
         return (
             f"Solutions: x = {sol_str}\n\n"
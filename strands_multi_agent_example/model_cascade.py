@@ -0,0 +1,254 @@
+"""
+Cost / latency-aware model cascade for the specialist agents.
+
+Most tutoring questions are answered just as well by a small, cheap model as by a large one. A
+ModelCascade asks the cheapest, fastest model first, and only escalates to the next, larger model when
+a cheap verifier flags the answer as low confidence:
+- the answer is empty or too short
+- the answer is a refusal ("I'm sorry, I can't ...")
+- an arithmetic statement in the answer is wrong, e.g. "12 * 4 = 46"
+- the model call failed, e.g. the model is not enabled in the account
+
+The models are tried in the order of the SPECIALIST_MODEL_CASCADE environment variable, a comma-separated
+list of Bedrock model ids. By default Nova Micro goes first, and the model the specialists used before
+comes second, so an escalated answer is never worse than it used to be. A single model id turns the
+cascade off.
+
+For every cascade, the metrics record how often each model answered, why answers were escalated, the
+estimated cost and the Bedrock latency. The savings compare them with sending every query to the last
+model: its price applied to the same token counts, and its mean latency.
+"""
+
+from __future__ import annotations
+
+import ast
+import logging
+import operator
+import os
+import re
+import threading
+import time
+
+from strands import Agent
+from strands.models import BedrockModel
+
+from .specialist_pool import AgentPool, agent_usage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CASCADE = "us.amazon.nova-micro-v1:0,meta.llama3-8b-instruct-v1:0"
+CASCADE_MODEL_IDS = [m.strip() for m in os.environ.get("SPECIALIST_MODEL_CASCADE", DEFAULT_CASCADE).split(",")
+                     if m.strip()]
+
+# Approximate on-demand prices in USD per million (input, output) tokens, used for the cost estimates
+MODEL_PRICES = {
+    "us.amazon.nova-micro-v1:0": (0.035, 0.14),
+    "us.amazon.nova-lite-v1:0": (0.06, 0.24),
+    "us.amazon.nova-pro-v1:0": (0.8, 3.2),
+    "meta.llama3-8b-instruct-v1:0": (0.3, 0.6),
+    "meta.llama3-70b-instruct-v1:0": (2.65, 3.5),
+    "global.anthropic.claude-haiku-4-5-20251001-v1:0": (1.0, 5.0),
+    "global.anthropic.claude-sonnet-4-20250514-v1:0": (3.0, 15.0),
+    "global.anthropic.claude-sonnet-4-5-20250929-v1:0": (3.0, 15.0),
+}
+
+MIN_ANSWER_CHARS = 2
+# Longer answers that start like a refusal ("I cannot stress enough...") are answers
+REFUSAL_MAX_CHARS = 300
+
+# Every cascade created in this process, by name
+cascades = {}
+
+REFUSAL_PATTERN = re.compile(
+    r"^\W*(i'?m sorry|i am sorry|sorry, (but )?i|i can(no|')t|i cannot|i am unable|i'?m unable|i'?m not able|"
+    r"as an ai\b)",
+    re.IGNORECASE,
+)
+
+# "12 * 4 = 48", "(3 + 5) / 2 = 4.0": numbers and operators, an equals sign and a number
+STATEMENT_PATTERN = re.compile(r"([\d.()+\-*/×÷ ]+)=\s*(-?\d[\d,]*(?:\.\d+)?)(?![\w.^(])")
+OPERATION_PATTERN = re.compile(r"[\d)]\s*[+\-*/×÷]\s*[\d(]")
+
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+def _evaluate(node):
+    """Value of an arithmetic expression AST made of numbers and + - * / only."""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.operand))
+    raise ValueError("not plain arithmetic")
+
+
+def arithmetic_errors(text: str) -> list[str]:
+    """Arithmetic statements of a text that do not hold, e.g. ["12*4 = 46"]."""
+    errors = []
+    for match in STATEMENT_PATTERN.finditer(text):
+        expression, stated = match.group(1).strip(), match.group(2)
+        # Skip algebra ("2x + 5 = 15": the match starts after the x) and plain numbers
+        if (match.start() > 0 and (text[match.start() - 1].isalnum() or text[match.start() - 1] in "^_=<>!,")) \
+                or not OPERATION_PATTERN.search(expression):
+            continue
+        expression = expression.replace("×", "*").replace("÷", "/")
+        try:
+            value = _evaluate(ast.parse(expression, mode="eval"))
+            expected = float(stated.replace(",", ""))
+        except (SyntaxError, ValueError, ZeroDivisionError, RecursionError):
+            continue
+        # Answers round their results: accept anything within 1% (or 0.01)
+        if abs(value - expected) > max(0.01, abs(value) * 0.01):
+            errors.append(f"{expression} = {stated}")
+    return errors
+
+
+def low_confidence_reason(query: str, answer: str) -> str | None:
+    """
+    Cheap verifier of a specialist answer
+    Returns:
+        why the answer should be escalated to a larger model ("empty", "refusal", "math_check"), or None
+    """
+    text = (answer or "").strip()
+    if len(text) < MIN_ANSWER_CHARS:
+        return "empty"
+    if len(text) <= REFUSAL_MAX_CHARS and REFUSAL_PATTERN.match(text):
+        return "refusal"
+    if arithmetic_errors(text):
+        return "math_check"
+    return None
+
+
+def estimated_cost(model_id: str, input_tokens: int, output_tokens: int) -> float:
+    """Estimated cost in USD of a call, 0 for a model without a known price."""
+    input_price, output_price = MODEL_PRICES.get(model_id, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+
+class ModelCascade:
+    """A specialist answered by the cheapest model whose answer passes the verifier."""
+
+    def __init__(self, name, system_prompt, model_ids=None, verifier=low_confidence_reason, **agent_kwargs):
+        """
+        Args:
+            name (str): specialist name, used in metrics and pool names
+            system_prompt (str): system prompt of the specialist agents
+            model_ids (list): Bedrock model ids, cheapest first. CASCADE_MODEL_IDS when None
+            verifier: function(query, answer) returning an escalation reason, or None to accept the answer
+            **agent_kwargs: extra Agent arguments, e.g. callback_handler
+        """
+        self.name = name
+        self.model_ids = list(model_ids or CASCADE_MODEL_IDS)
+        self.verifier = verifier
+        self._lock = threading.Lock()
+        self._models = {}
+        # Models and agents are built on first use: importing a specialist costs nothing
+        self.pools = [
+            AgentPool(
+                f"{name} ({model_id})",
+                lambda model_id=model_id: Agent(model=self._model(model_id), system_prompt=system_prompt,
+                                                **agent_kwargs),
+            )
+            for model_id in self.model_ids
+        ]
+        self.queries = 0
+        self.answered_by = {model_id: 0 for model_id in self.model_ids}
+        self.escalations = {}
+        self.cost = 0.0
+        self.baseline_cost = 0.0
+        self.latency_ms = 0.0
+        self.baseline_calls = 0
+        self.baseline_latency_ms = 0.0
+        cascades[name] = self
+
+    def _model(self, model_id):
+        """The BedrockModel of a model id, built once and shared by the agents of its pool."""
+        with self._lock:
+            if model_id not in self._models:
+                self._models[model_id] = BedrockModel(model_id=model_id, temperature=0.3, streaming=False)
+            return self._models[model_id]
+
+    def __call__(self, query: str) -> str:
+        """
+        Answer a query, escalating while the verifier flags the answer
+        Returns:
+            the accepted answer, or the last model's answer whatever the verifier says
+        Raises:
+            the last model's exception when its call fails
+        """
+        cost = latency_ms = 0.0
+        top = len(self.pools) - 1
+        for tier, (model_id, pool) in enumerate(zip(self.model_ids, self.pools)):
+            start = time.perf_counter()
+            error = None
+            with pool.checkout() as agent:
+                before = agent_usage(agent)
+                try:
+                    answer = str(agent(query)).strip()
+                except Exception as e:
+                    if tier == top:
+                        raise
+                    error = e
+                used = [a - b for a, b in zip(agent_usage(agent), before)]
+            call_latency = used[0] or (time.perf_counter() - start) * 1000
+            cost += estimated_cost(model_id, used[1], used[2])
+            latency_ms += call_latency
+
+            reason = "error" if error is not None else self.verifier(query, answer)
+            if reason is None or tier == top:
+                self._record(model_id, tier == top, cost, latency_ms, call_latency, used[1], used[2])
+                return answer
+            logger.info("Escalating %s answer from %s: %s", self.name, model_id, reason)
+            with self._lock:
+                self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def _record(self, model_id, by_top, cost, latency_ms, call_latency, input_tokens, output_tokens):
+        with self._lock:
+            self.queries += 1
+            self.answered_by[model_id] += 1
+            self.cost += cost
+            self.latency_ms += latency_ms
+            # What the accepted answer would have cost on the last model alone
+            self.baseline_cost += estimated_cost(self.model_ids[-1], input_tokens, output_tokens)
+            if by_top:
+                self.baseline_calls += 1
+                self.baseline_latency_ms += call_latency
+
+    def stats(self) -> dict:
+        """
+        Cascade metrics since start-up
+        Returns:
+            dict with queries, escalated queries, escalation rate and reasons, answers per model, cost and
+            latency, and the estimated savings against the last model alone (latency once that model has
+            answered)
+        """
+        with self._lock:
+            escalated = self.queries - self.answered_by[self.model_ids[0]]
+            baseline_latency = self.baseline_latency_ms / self.baseline_calls if self.baseline_calls else None
+            return {
+                "cascade": self.name,
+                "queries": self.queries,
+                "escalated": escalated,
+                "escalation_rate": escalated / self.queries if self.queries else 0.0,
+                "escalations": dict(self.escalations),
+                "answered_by": dict(self.answered_by),
+                "cost_usd": self.cost,
+                "saved_usd": self.baseline_cost - self.cost,
+                "bedrock_ms": self.latency_ms,
+                "saved_ms": (baseline_latency * self.queries - self.latency_ms) if baseline_latency else 0.0,
+            }
+
+
+def cascade_stats() -> list[dict]:
+    """Metrics of every specialist cascade."""
+    return [cascade.stats() for cascade in cascades.values()]
@@ -1,12 +1,9 @@
 from __future__ import annotations
 
 from strands import tool
-from strands import Agent
-from strands.models import BedrockModel
 
+from .model_cascade import ModelCascade
 
-BEDROCK_MODEL_ID = "meta.llama3-8b-instruct-v1:0"
-bedrock_model = BedrockModel(model_id=BEDROCK_MODEL_ID, temperature=0.3, streaming=False)
 
 GENERAL_SYSTEM_PROMPT = """
 You are a helpful general assistant.
@@ -14,13 +11,14 @@ Answer clearly and concisely.
 Do NOT call any tools. Return only text.
 """.strip()
 
+# Cheapest model first, escalated to a larger one when the answer looks wrong
+general_cascade = ModelCascade("general", GENERAL_SYSTEM_PROMPT, callback_handler=None)
+
 
 @tool
 def general_assistant(query: str) -> str:
     print("Routed to General Assistant")
     try:
-        general_agent = Agent(model=bedrock_model, system_prompt=GENERAL_SYSTEM_PROMPT, callback_handler=None)
-        resp = general_agent(query)
-        return str(resp).strip()
+        return general_cascade(query)
     except Exception as e:
         return f"Error processing your general query: {str(e)}"
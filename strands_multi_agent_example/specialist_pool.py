@@ -0,0 +1,148 @@
+"""
+Pool of reusable specialist agents for the teacher's assistant tools.
+
+Building an Agent on every call repeats its setup (tool registry, event loop, model client lookups),
+while sharing a single module-level Agent between calls keeps growing its message history and breaks
+as soon as two threads use it at once. A pool holds up to a fixed number of agents:
+- a call checks out an idle agent, builds a new one when none is idle and the pool is not full yet,
+  and otherwise waits for one to come back. Nothing is built before the first call
+- an agent's conversation is cleared when it is returned, so every call starts from a clean state
+- the time spent waiting for an agent is recorded, to size the pool
+- the Bedrock latency and tokens an agent used while checked out are added to the calling thread's
+  totals (thread_usage), so a caller can tell what one query cost even when queries run concurrently
+
+The pool size comes from the SPECIALIST_POOL_SIZE environment variable (4 by default).
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = int(os.environ.get("SPECIALIST_POOL_SIZE", 4))
+
+# Every pool created in this process, by name
+pools = {}
+
+_thread_usage = threading.local()
+
+
+def agent_usage(agent):
+    """
+    Accumulated Bedrock latency and token usage of an agent
+    Returns:
+        tuple (latency in ms, input tokens, output tokens)
+    """
+    metrics = getattr(agent, "event_loop_metrics", None)
+    usage = getattr(metrics, "accumulated_usage", None) or {}
+    latency = (getattr(metrics, "accumulated_metrics", None) or {}).get("latencyMs", 0)
+    return latency, usage.get("inputTokens", 0), usage.get("outputTokens", 0)
+
+
+def thread_usage():
+    """
+    Bedrock usage of the pooled agents checked out by the current thread so far
+    Returns:
+        tuple (latency in ms, input tokens, output tokens), to subtract from a later reading
+    """
+    return getattr(_thread_usage, "totals", (0, 0, 0))
+
+
+class AgentPool:
+    """Pool of up to size identical agents, built on demand and checked out one call at a time."""
+
+    def __init__(self, name, factory, size=DEFAULT_POOL_SIZE):
+        """
+        Args:
+            name (str): pool name, used in metrics
+            factory: function building one agent
+            size (int): maximum number of agents in the pool
+        """
+        self.name = name
+        self.size = size
+        self._factory = factory
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.checkouts = 0
+        self.waited = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        pools[name] = self
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """
+        Borrow an agent for the duration of a with block
+        Args:
+            timeout (float): seconds to wait for an agent, forever when None
+        Raises:
+            TimeoutError: when no agent was returned within the timeout
+        """
+        start = time.perf_counter()
+        agent = self._acquire(timeout)
+        wait = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            if wait > 0.001:
+                self.waited += 1
+        before = agent_usage(agent)
+        try:
+            yield agent
+        finally:
+            after = agent_usage(agent)
+            _thread_usage.totals = tuple(t + a - b for t, a, b in zip(thread_usage(), after, before))
+            # Return the agent with an empty conversation
+            agent.messages.clear()
+            self._idle.put(agent)
+
+    def _acquire(self, timeout):
+        """An idle agent, a new one while the pool is not full, or the next agent returned."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            build = self.created < self.size
+            if build:
+                self.created += 1
+        if build:
+            try:
+                return self._factory()
+            except BaseException:
+                with self._lock:
+                    self.created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No {self.name} agent available after {timeout}s")
+
+    def stats(self):
+        """
+        Pool metrics since start-up
+        Returns:
+            dict with pool size, agents built so far, idle agents, checkouts, checkouts that had to wait,
+            mean and max wait
+        """
+        with self._lock:
+            return {
+                "pool": self.name,
+                "size": self.size,
+                "created": self.created,
+                "idle": self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "waited": self.waited,
+                "mean_wait_ms": 1000 * self.total_wait_seconds / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": 1000 * self.max_wait_seconds,
+            }
+
+
+def pool_stats():
+    """Metrics of every specialist pool."""
+    return [pool.stats() for pool in pools.values()]
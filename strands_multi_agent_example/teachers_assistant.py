@@ -14,22 +14,40 @@ What you still get:
 ✅ Orchestrator ("Teacher's Assistant") + Specialists
 ✅ Routing logs ("Routed to X Assistant")
 ✅ Same CLI experience
+✅ Batch evaluation of a JSONL file of queries (--batch), with record / replay for offline runs
 
 Model used:
-- meta.llama3-8b-instruct-v1:0
+- meta.llama3-8b-instruct-v1:0 for routing
+- specialists: a model cascade, cheapest model first (see model_cascade.py)
 """
 
 from __future__ import annotations
 
+import argparse
+import json
+import os
 import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
 from strands import Agent
 from strands.models import BedrockModel
 
-from computer_science_assistant import computer_science_assistant
-from english_assistant import english_assistant
-from language_assistant import language_assistant
-from math_assistant import math_assistant
-from no_expertise import general_assistant
+if not __package__:
+    # Run as a script from this folder: make the package (and the repository modules) importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strands_multi_agent_example.computer_science_assistant import computer_science_assistant
+from strands_multi_agent_example.english_assistant import english_assistant
+from strands_multi_agent_example.language_assistant import language_assistant
+from strands_multi_agent_example.math_assistant import math_assistant
+from strands_multi_agent_example.model_cascade import cascade_stats
+from strands_multi_agent_example.no_expertise import general_assistant
+from strands_multi_agent_example.specialist_pool import AgentPool, thread_usage
 
 
 # -----------------------------
@@ -64,14 +82,56 @@ Rules:
 Do NOT answer the user. Only output the label.
 """.strip()
 
-teacher_classifier = Agent(
-    model=bedrock_model,
-    system_prompt=TEACHER_SYSTEM_PROMPT,
-    callback_handler=None,
+# Pooled, so that concurrent queries (batch mode) never share a classifier conversation
+classifier_pool = AgentPool(
+    "classifier",
+    lambda: Agent(model=bedrock_model, system_prompt=TEACHER_SYSTEM_PROMPT, callback_handler=None),
+)
+
+# Multi-label mode: a cross-domain query goes to every specialist it needs, concurrently.
+MULTI_LABEL_SYSTEM_PROMPT = """
+You are TeachAssist, a query router. Your only job is to list the labels a user query needs.
+
+Labels (uppercase):
+MATH
+ENGLISH
+LANGUAGE
+COMPSCI
+GENERAL
+
+Rules:
+- MATH: equations, arithmetic, algebra, calculus, geometry, statistics, word problems
+- ENGLISH: grammar, writing, comprehension, literature, rewriting, tone, summaries
+- LANGUAGE: translation between languages, meaning in another language, bilingual phrasing
+- COMPSCI: programming, code, debugging, algorithms, data structures, terminal, software engineering
+- GENERAL: anything else, only when no other label applies
+- A query asking for several things gets several labels, e.g. "translate this and fix its grammar"
+  is LANGUAGE, ENGLISH
+
+Do NOT answer the user. Only output the labels, separated by commas.
+""".strip()
+
+multi_label_pool = AgentPool(
+    "multi_label_classifier",
+    lambda: Agent(model=bedrock_model, system_prompt=MULTI_LABEL_SYSTEM_PROMPT, callback_handler=None),
 )
 
 VALID_LABELS = {"MATH", "ENGLISH", "LANGUAGE", "COMPSCI", "GENERAL"}
 
+LABEL_TITLES = {
+    "MATH": "Math",
+    "ENGLISH": "English",
+    "LANGUAGE": "Language",
+    "COMPSCI": "Computer Science",
+    "GENERAL": "General",
+}
+
+# Seconds a specialist gets to answer in multi-label mode
+SPECIALIST_TIMEOUT_SECONDS = 60
+
+# One worker per specialist: a query never needs more
+specialist_executor = ThreadPoolExecutor(max_workers=len(VALID_LABELS), thread_name_prefix="specialist")
+
 
 def _normalize_label(text: str) -> str:
     """Extract a routing label from model output robustly."""
@@ -88,10 +148,31 @@ def _normalize_label(text: str) -> str:
 
 def determine_route(query: str) -> str:
     """Ask the classifier agent to output a label, then normalize it."""
-    resp = teacher_classifier(query)
+    with classifier_pool.checkout() as teacher_classifier:
+        resp = teacher_classifier(query)
     return _normalize_label(str(resp))
 
 
+def _normalize_labels(text: str) -> list[str]:
+    """Extract the routing labels from model output, in order and without duplicates."""
+    labels = []
+    for label in re.findall(r"\b(MATH|ENGLISH|LANGUAGE|COMPSCI|GENERAL)\b", (text or "").upper()):
+        if label not in labels:
+            labels.append(label)
+    # GENERAL only stands for "nothing else applies"
+    if len(labels) > 1 and "GENERAL" in labels:
+        labels.remove("GENERAL")
+    return labels or ["GENERAL"]
+
+
+def determine_routes(query: str) -> list[str]:
+    """Ask the multi-label classifier for every label the query needs."""
+    # Pooled agents come back with an empty conversation: each query is classified on its own
+    with multi_label_pool.checkout() as multi_label_classifier:
+        resp = multi_label_classifier(query)
+    return _normalize_labels(str(resp))
+
+
 def dispatch(label: str, query: str) -> str:
     """
     Call the specialist directly (manual routing).
@@ -109,7 +190,229 @@ def dispatch(label: str, query: str) -> str:
     return general_assistant(query)
 
 
+def dispatch_many(labels: list[str], query: str, timeout: float = SPECIALIST_TIMEOUT_SECONDS) -> dict[str, str]:
+    """
+    Call several specialists concurrently, so the total latency is that of the slowest one.
+
+    A specialist that does not answer within the timeout is reported as such. Its call cannot be
+    interrupted: it finishes in the background and its answer is dropped.
+    """
+    start = time.perf_counter()
+    futures = {label: specialist_executor.submit(dispatch, label, query) for label in labels}
+    wait(futures.values(), timeout=timeout)
+    answers = {}
+    for label, future in futures.items():
+        if not future.done():
+            future.cancel()
+            answers[label] = f"(No answer within {timeout:g}s)"
+        elif future.exception() is not None:
+            answers[label] = f"Error processing your query: {future.exception()}"
+        else:
+            answers[label] = str(future.result()).strip()
+    print(f"Specialists answered in {time.perf_counter() - start:.1f}s")
+    return answers
+
+
+def merge_answers(answers: dict[str, str]) -> str:
+    """Combine specialist answers into one response, one section per specialist."""
+    if len(answers) == 1:
+        return next(iter(answers.values()))
+    return "\n\n".join(f"## {LABEL_TITLES[label]}\n{answer}" for label, answer in answers.items())
+
+
+# -----------------------------
+# Batch evaluation
+# -----------------------------
+BATCH_CONCURRENCY = 8
+
+
+class Recording:
+    """
+    Router and specialist outputs saved to, or replayed from, a JSON lines file.
+
+    Recording a batch run and replaying it later gives the same labels, answers and token figures
+    without calling Bedrock, so a grading run can be repeated offline. Entries can also be written by
+    hand to stub the models: {"kind": "route" | "routes" | "answer", "label": ..., "query": ..., "output": ...}.
+
+    Use it as a context manager: the recording file is closed however the run ends, and every call is
+    flushed as soon as it is recorded, so a crashed run keeps what it recorded.
+    """
+    def __init__(self, path: str, replay: bool):
+        self.path = path
+        self.replay = replay
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if replay:
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[(entry["kind"], entry.get("label"), entry["query"])] = entry
+        else:
+            self._file = open(path, "a")
+
+    def call(self, kind: str, label: str | None, query: str, fn):
+        """
+        Output and usage of fn(), recorded, or replayed without calling fn
+        Args:
+            fn: function returning (output, (bedrock latency ms, input tokens, output tokens))
+        Raises:
+            LookupError: when replaying a call that was not recorded
+        """
+        if self.replay:
+            entry = self._entries.get((kind, label, query))
+            if entry is None:
+                raise LookupError(f"No recorded {kind}{' ' + label if label else ''} for query: {query[:80]}")
+            return entry["output"], tuple(entry.get("usage", (0, 0, 0)))
+        output, usage = fn()
+        with self._lock:
+            self._file.write(json.dumps(
+                {"kind": kind, "label": label, "query": query, "output": output, "usage": usage}) + "\n")
+            self._file.flush()
+        return output, usage
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> Recording:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _measured(fn, *args):
+    """Result of fn(*args) and the Bedrock usage of the pooled agents it ran on this thread."""
+    before = thread_usage()
+    result = fn(*args)
+    return result, tuple(a - b for a, b in zip(thread_usage(), before))
+
+
+def _call(recording: Recording | None, kind: str, label: str | None, query: str, fn, *args):
+    if recording is None:
+        return _measured(fn, *args)
+    return recording.call(kind, label, query, lambda: _measured(fn, *args))
+
+
+def evaluate_query(record: dict, multi_label: bool = False, recording: Recording | None = None) -> dict:
+    """
+    Route and answer one batch query
+    Args:
+        record (dict): input line, with the query under "query" and optionally an "id" and the
+            "expected_label"
+    Returns:
+        result dict: labels, answer, per-stage latency, Bedrock latency and tokens, error
+    """
+    query = record["query"]
+    result = {"id": record.get("id"), "query": query}
+    start = time.perf_counter()
+    usage = (0, 0, 0)
+    try:
+        if multi_label:
+            labels, usage = _call(recording, "routes", None, query, determine_routes, query)
+        else:
+            label, usage = _call(recording, "route", None, query, determine_route, query)
+            labels = [label]
+        routed = time.perf_counter()
+        # Specialists run one after the other: the batch is already concurrent across queries
+        answers = {}
+        for label in labels:
+            answers[label], answer_usage = _call(recording, "answer", label, query, dispatch, label, query)
+            usage = tuple(a + b for a, b in zip(usage, answer_usage))
+        result.update(labels=labels, answer=merge_answers(answers), error=None,
+                      route_ms=round((routed - start) * 1000, 1),
+                      answer_ms=round((time.perf_counter() - routed) * 1000, 1))
+    except Exception as e:
+        result.update(labels=[], answer=None, error=str(e))
+    result.update(total_ms=round((time.perf_counter() - start) * 1000, 1), bedrock_latency_ms=usage[0],
+                  input_tokens=usage[1], output_tokens=usage[2])
+    if "expected_label" in record:
+        result["expected_label"] = record["expected_label"]
+        result["correct"] = str(record["expected_label"]).upper() in result["labels"]
+    return result
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def run_batch(input_path: str, output_path: str, concurrency: int = BATCH_CONCURRENCY,
+              multi_label: bool = False, recording: Recording | None = None) -> dict:
+    """
+    Evaluate every query of a JSON lines file, at most concurrency at a time
+    Results are written to output_path in input order, as soon as they are available.
+    Returns:
+        summary dict: counts, label distribution, accuracy, latency percentiles, token totals
+    """
+    with open(input_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    # A line can also be just the query string
+    records = [{"query": r} if isinstance(r, str) else r for r in records]
+
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor, \
+            open(output_path, "w") as out:
+        for result in executor.map(lambda r: evaluate_query(r, multi_label, recording), records):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            results.append(result)
+            if len(results) % 100 == 0:
+                print(f"{len(results)}/{len(records)} queries evaluated", file=sys.stderr)
+    wall = time.perf_counter() - start
+
+    latencies = sorted(r["total_ms"] for r in results)
+    label_counts = {}
+    for r in results:
+        for label in r["labels"]:
+            label_counts[label] = label_counts.get(label, 0) + 1
+    graded = [r["correct"] for r in results if "correct" in r]
+    return {
+        "queries": len(results),
+        "errors": sum(1 for r in results if r["error"]),
+        "wall_seconds": round(wall, 2),
+        "queries_per_second": round(len(results) / wall, 2) if wall else 0.0,
+        "p50_ms": round(statistics.median(latencies), 1) if latencies else 0.0,
+        "p90_ms": _percentile(latencies, 0.9),
+        "p99_ms": _percentile(latencies, 0.99),
+        "input_tokens": sum(r["input_tokens"] for r in results),
+        "output_tokens": sum(r["output_tokens"] for r in results),
+        "labels": label_counts,
+        "accuracy": round(sum(graded) / len(graded), 4) if graded else None,
+        # Empty when replaying: no model is called
+        "cascades": [s for s in cascade_stats() if s["queries"]],
+    }
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Teacher's Assistant with manual routing to specialists")
+    parser.add_argument("--multi-label", action="store_true",
+                        help="route a query to every specialist it needs, run them concurrently and merge the answers")
+    parser.add_argument("--timeout", type=float, default=SPECIALIST_TIMEOUT_SECONDS,
+                        help="seconds each specialist gets to answer in multi-label mode")
+    parser.add_argument("--batch", metavar="INPUT_JSONL",
+                        help="evaluate the queries of a JSON lines file instead of the interactive loop")
+    parser.add_argument("--output", default="results.jsonl", help="batch results file (JSON lines)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="queries evaluated at the same time in batch mode")
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument("--record", metavar="RECORDING_JSONL",
+                           help="save router and specialist outputs of the batch for later replay")
+    recording.add_argument("--replay", metavar="RECORDING_JSONL",
+                           help="answer the batch from a recording, without calling the models")
+    args = parser.parse_args()
+
+    if args.batch:
+        recording_path = args.record or args.replay
+        with Recording(recording_path, replay=bool(args.replay)) if recording_path else nullcontext() as recording:
+            summary = run_batch(args.batch, args.output, args.concurrency, args.multi_label, recording)
+        print(json.dumps(summary, indent=2))
+        return
+
     print("\n📁 Teacher's Assistant Strands Agent 📁\n")
     print("Ask a question in any subject area, and I'll route it to the appropriate specialist.")
     print("Type 'exit' to quit.")
@@ -123,10 +426,16 @@ def main() -> None:
                 print("\nGoodbye! 👋")
                 break
 
-            label = determine_route(user_input)
-            print(f"Routed to: {label}")
+            if args.multi_label:
+                labels = determine_routes(user_input)
+                print(f"Routed to: {', '.join(labels)}")
+
+                answer = merge_answers(dispatch_many(labels, user_input, args.timeout))
+            else:
+                label = determine_route(user_input)
+                print(f"Routed to: {label}")
 
-            answer = dispatch(label, user_input)
+                answer = dispatch(label, user_input)
             print(str(answer).strip())
 
         except KeyboardInterrupt:
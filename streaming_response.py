@@ -0,0 +1,130 @@
+"""
+Streaming agent responses for the TeachAssist Streamlit apps.
+
+Calling agent(query) blocks until the whole answer is generated, so users stare at a spinner for the
+full duration of the request. Agent.stream_async yields text deltas as soon as the model produces them:
+this module renders them into a Streamlit placeholder as they arrive, shows which tool the agent is
+using while no text is flowing, and records the time to first token.
+
+Redrawing the placeholder on every delta sends one websocket message per token, so redraws are
+throttled to at most one every min_interval seconds. The final text is always drawn.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+
+CURSOR = "▌"
+
+# Timings of the most recent streamed responses, shared by all sessions
+response_timings = deque(maxlen=200)
+_timings_lock = threading.Lock()
+
+
+class StreamingResponse:
+    """Render an agent response into a placeholder while it is generated."""
+    def __init__(self, placeholder, min_interval=0.05, should_stop=None):
+        """
+        Args:
+            placeholder: Streamlit element with a markdown method, e.g. st.empty()
+            min_interval (float): minimum number of seconds between two redraws
+            should_stop: optional function returning True when the response is no longer wanted
+        """
+        self.placeholder = placeholder
+        self.min_interval = min_interval
+        self.should_stop = should_stop
+        self.text = ""
+        self.tools = []
+        self.result = None
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self._started_at = None
+        self._last_draw = 0.0
+
+    def _draw(self):
+        now = time.perf_counter()
+        if now - self._last_draw < self.min_interval:
+            return
+        self._last_draw = now
+        status = f"\n\n_Using {self.tools[-1][0]}..._" if self.tools and not self.text else ""
+        self.placeholder.markdown(self.text + CURSOR + status)
+
+    async def _consume(self, agent, prompt, **kwargs):
+        async for event in agent.stream_async(prompt, **kwargs):
+            if self.should_stop is not None and self.should_stop():
+                break
+            if "data" in event:
+                if self.first_token_seconds is None:
+                    self.first_token_seconds = time.perf_counter() - self._started_at
+                self.text += event["data"]
+                self._draw()
+            elif "current_tool_use" in event:
+                # Tool use events repeat for every input delta: report each tool once
+                name = event["current_tool_use"].get("name")
+                tool_use_id = event["current_tool_use"].get("toolUseId")
+                if name and (name, tool_use_id) not in self.tools:
+                    self.tools.append((name, tool_use_id))
+                    self.placeholder.markdown(f"{self.text}\n\n_Using {name}..._")
+            elif "result" in event:
+                self.result = event["result"]
+
+    def run(self, agent, prompt, **kwargs):
+        """
+        Stream an agent response into the placeholder
+        Args:
+            agent: strands Agent
+            prompt (str): user prompt
+            **kwargs: extra arguments for Agent.stream_async, e.g. invocation_state
+        Returns:
+            the complete response text
+        """
+        self._started_at = time.perf_counter()
+        # The Streamlit script thread has no running event loop
+        asyncio.run(self._consume(agent, prompt, **kwargs))
+        self.total_seconds = time.perf_counter() - self._started_at
+        if not self.text and self.result is not None:
+            self.text = str(self.result)
+        self.placeholder.markdown(self.text)
+        with _timings_lock:
+            response_timings.append(self.timings())
+        return self.text
+
+    def timings(self):
+        """Time to first token and total time of the last run, in seconds, and the tools it used."""
+        return {
+            "first_token_seconds": self.first_token_seconds,
+            "total_seconds": self.total_seconds,
+            "tools": [name for name, _ in self.tools],
+        }
+
+
+def run_agent(agent, prompt, placeholder=None, **kwargs):
+    """
+    Run an agent, streaming its response into placeholder when one is given. Placeholders with a
+    stopped() method, like AgentJob, end the stream early once it returns True
+    Returns:
+        the response text
+    """
+    if placeholder is None:
+        return str(agent(prompt, **kwargs))
+    response = StreamingResponse(placeholder, should_stop=getattr(placeholder, "stopped", None))
+    return response.run(agent, prompt, **kwargs)
+
+
+def timing_stats():
+    """
+    Median time to first token and total time of the recent streamed responses
+    Returns:
+        dict with the number of responses, p50 time to first token and p50 total time in seconds
+    """
+    with _timings_lock:
+        timings = list(response_timings)
+    first_tokens = [t["first_token_seconds"] for t in timings if t["first_token_seconds"] is not None]
+    totals = [t["total_seconds"] for t in timings]
+    return {
+        "responses": len(timings),
+        "p50_first_token_seconds": statistics.median(first_tokens) if first_tokens else 0.0,
+        "p50_total_seconds": statistics.median(totals) if totals else 0.0,
+    }
@@ -1,13 +1,23 @@
-import boto3
 import json
 import os
 import streamlit as st
 
-from strands import Agent
-from strands.models import BedrockModel
 from strands_tools import use_agent, memory, mem0_memory
 
+from app_components import (
+    get_conversation, session_user_id, show_agent_job, show_history, show_retrieval_cache_stats,
+    show_router_stats, show_stage_metrics, speculation_toggle, streaming_toggle,
+)
+from agent_cache import get_cached_agent, invalidate_agents
+from agent_jobs import submit_job
+from query_router import query_router
+from retrieval_cache import retrieval_cache
+from stage_metrics import QueryTrace, stage_log, trace_stage
+from streaming_response import run_agent
+from speculative_routing import speculate
+
 from config_file import Config
+from ssm_config_cache import parameter_cache
 from utils.auth import Auth
 from utils.llm import Llm
 
@@ -40,8 +50,8 @@ def logout():
     authenticator.logout()
 
 
-# Setup SSM
-ssm = boto3.client('ssm', region_name=region)
+# Setup SSM: parameters are cached for the whole process, reruns read them from memory
+ssm_config = parameter_cache(region)
 
 
 # Define the teacher's assistant system prompt
@@ -153,11 +163,7 @@ st.title("TeachAssist - Educational Assistant")
 st.write("Ask a question in any subject area or store/retrieve personal information.")
 
 # Check if OpenSearch is available
-try:
-    response = ssm.get_parameter(Name='OPENSEARCH_HOST')
-    OPENSEARCH_HOST = response['Parameter']['Value']
-except Exception as e:
-    OPENSEARCH_HOST = os.environ.get('OPENSEARCH_HOST', None)
+OPENSEARCH_HOST = ssm_config.get('OPENSEARCH_HOST') or os.environ.get('OPENSEARCH_HOST', None)
 has_opensearch = OPENSEARCH_HOST is not None
 
 # Sidebar configuration
@@ -187,34 +193,44 @@ model_options = [
 selected_model = st.sidebar.selectbox(
     "Select Model",
     options=model_options,
-    index=0
+    index=0,
+    on_change=invalidate_agents
 )
 
 # Teacher agent toggles
 st.sidebar.header("Teacher Agent Tools")
-use_math = st.sidebar.checkbox("Math Assistant", value=True)
-use_language = st.sidebar.checkbox("Language Assistant", value=True)
-use_english = st.sidebar.checkbox("English Assistant", value=True)
-use_cs = st.sidebar.checkbox("Computer Science Assistant", value=True)
-use_general = st.sidebar.checkbox("General Assistant", value=True)
+use_math = st.sidebar.checkbox("Math Assistant", value=True, on_change=invalidate_agents)
+use_language = st.sidebar.checkbox("Language Assistant", value=True, on_change=invalidate_agents)
+use_english = st.sidebar.checkbox("English Assistant", value=True, on_change=invalidate_agents)
+use_cs = st.sidebar.checkbox("Computer Science Assistant", value=True, on_change=invalidate_agents)
+use_general = st.sidebar.checkbox("General Assistant", value=True, on_change=invalidate_agents)
+
+# Local router statistics (process-wide)
+show_router_stats()
+
+# Streaming: render the answer as it is generated instead of waiting for the whole response
+use_streaming = streaming_toggle()
 
-# Initialize session state for conversation history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Speculative retrieval: start the knowledge base lookup while the query is still being routed
+use_speculation = speculation_toggle()
 
-# Display conversation history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Per-stage latency and token usage (process-wide)
+show_stage_metrics()
+
+# Identify the user for per-user caches: the Cognito user name, or a per-session id
+user_id = session_user_id(st.session_state.get("auth_username"))
+
+# Retrieval cache statistics (process-wide)
+show_retrieval_cache_stats()
+
+# Initialize the conversation window: recent turns verbatim, older turns summarized in the background
+conversation = get_conversation(user_id)
+
+# Display conversation history: only the most recent page, older pages on demand
+show_history(conversation, user_id)
 
 # Initialize the teacher agent
 def get_teacher_agent():
-    # Specify the Bedrock ModelID
-    bedrock_model = BedrockModel(
-        model_id=selected_model,
-        temperature=0.3,
-    )
-    
     # Select tools based on user toggles
     tools = []
     if use_math:
@@ -232,36 +248,54 @@ def get_teacher_agent():
     if not tools:
         tools = [general_assistant]
     
-    # Create the teacher agent with specialized tools
-    return Agent(
-        model=bedrock_model,
+    # Reuse the teacher agent with specialized tools (cached per model, temperature and enabled tools)
+    agent = get_cached_agent(
+        "teacher",
+        selected_model,
+        0.3,
+        tools,
         system_prompt=TEACHER_SYSTEM_PROMPT,
         callback_handler=None,
-        tools=tools,
     )
+    # Give the agent the bounded conversation history (none unless CONVERSATION_CONTEXT is on)
+    agent.messages.extend(conversation.context_messages())
+    return agent
 
 # Initialize the knowledge base agent
 def get_kb_agent():
-    # Specify the Bedrock ModelID
-    bedrock_model = BedrockModel(
-        model_id=selected_model,
-        temperature=0.3,
-    )
-    
-    # Create the knowledge base agent with memory tools
-    return Agent(
-        model=bedrock_model,
-        tools=[memory, use_agent],
+    # Reuse the knowledge base agent with memory tools
+    return get_cached_agent("knowledgebase", selected_model, 0.3, [memory, use_agent])
+
+# Initialize the retriever agent used by speculative retrieval
+def get_retriever_agent():
+    # Separate from the knowledge base agent, which may be in use while the speculation runs
+    return get_cached_agent("retriever", selected_model, 0.3, [memory])
+
+# Knowledge base retrieval parameters
+RETRIEVE_PARAMS = {
+    "min_score": 0.00001,  # Set reasonable minimum score threshold
+    "max_results": 9,  # Retrieve a good number of results
+}
+
+def retrieve_memories(agent, query, user_id):
+    """Query the knowledge base, reusing the user's recent results for the same query."""
+    return retrieval_cache.get_or_retrieve(
+        user_id,
+        query,
+        lambda: agent.tool.memory(action="retrieve", query=query, **RETRIEVE_PARAMS),
+        **RETRIEVE_PARAMS
     )
 
+def start_speculative_retrieval(query, decision):
+    """Start the knowledge base lookup unless the router already ruled it out."""
+    if not use_speculation or decision.action == "teacher" or decision.kb_action == "store":
+        return None
+    # Check out the agent here: session state is not available in the worker thread
+    agent = get_retriever_agent()
+    return speculate(lambda: retrieve_memories(agent, query, user_id))
+
 # Initialize the memory agent with OpenSearch backend
 def get_memory_agent():
-    # Specify the Bedrock ModelID
-    bedrock_model = BedrockModel(
-        model_id=selected_model,
-        temperature=0.1,
-    )
-    
     # System prompt for the memory agent
     MEMORY_SYSTEM_PROMPT = """You are a personal assistant that maintains context by remembering user details.
 
@@ -279,16 +313,23 @@ def get_memory_agent():
     - Politely indicate when information is unavailable
     """
     
-    # Create the memory agent with mem0_memory tools
-    return Agent(
-        model=bedrock_model,
+    # Reuse the memory agent with mem0_memory tools
+    return get_cached_agent(
+        "memory",
+        selected_model,
+        0.1,
+        [mem0_memory, use_agent],
         system_prompt=MEMORY_SYSTEM_PROMPT,
-        tools=[mem0_memory, use_agent],
     )
 
-def determine_action(query):
+def determine_action(query, decision=None, agent=None):
     """Determine if the query should be handled by the teacher agent or knowledge base agent."""
-    agent = get_kb_agent()
+    # Use the local router when it is confident, and only ask the LLM otherwise
+    decision = decision or query_router.route(query)
+    if decision.action is not None:
+        return decision.action
+
+    agent = agent if agent is not None else get_kb_agent()
     
     result = agent.tool.use_agent(
         prompt=f"Query: {query}",
@@ -304,49 +345,65 @@ def determine_action(query):
     else:
         return "knowledgebase"
 
-def run_kb_agent(query):
+def run_kb_agent(query, decision=None, speculation=None, placeholder=None, agent=None, history=None, trace=None):
     """Process a user query with the knowledge base agent."""
-    agent = get_kb_agent()
-    
-    # Determine the action - store or retrieve
-    result = agent.tool.use_agent(
-        prompt=f"Query: {query}",
-        system_prompt=KB_ACTION_SYSTEM_PROMPT
-    )
+    agent = agent if agent is not None else get_kb_agent()
     
-    # Clean and extract the action
-    action_text = str(result).lower().strip()
+    # Determine the action - store or retrieve (locally when the router is confident)
+    decision = decision or query_router.route(query)
+    with trace_stage(trace, "store_retrieve", local=decision.kb_action is not None):
+        if decision.kb_action is not None:
+            action_text = decision.kb_action
+        else:
+            result = agent.tool.use_agent(
+                prompt=f"Query: {query}",
+                system_prompt=KB_ACTION_SYSTEM_PROMPT
+            )
+        
+            # Clean and extract the action
+            action_text = str(result).lower().strip()
     
     # Default to retrieve if response isn't clear
     if "store" in action_text:
         # For store actions, store the full query
-        agent.tool.memory(action="store", content=query)
+        if speculation is not None:
+            speculation.cancel()
+        with trace_stage(trace, "store"):
+            agent.tool.memory(action="store", content=query)
+        # The user's cached retrievals no longer reflect what they stored
+        retrieval_cache.invalidate_user(user_id)
         return "I've stored this information."
     else:
-        # For retrieve actions, query the knowledge base with appropriate parameters
-        result = agent.tool.memory(
-            action="retrieve", 
-            query=query,
-            min_score=0.00001, # Set reasonable minimum score threshold
-            max_results=9      # Retrieve a good number of results
-        )
+        # For retrieve actions, use the speculative lookup when it was started
+        with trace_stage(trace, "retrieve", speculative=speculation is not None):
+            if speculation is not None:
+                result = speculation.result()
+            else:
+                result = retrieve_memories(agent, query, user_id)
         # Convert the result to a string to extract just the content text
         result_str = str(result)
         
-        # Generate a clear, conversational answer using the retrieved information
-        answer = agent(
-            prompt=f"User question: \"{query}\"\n\nInformation from knowledge base (only use 'Response'):\n{result_str}\n\nProvide a helpful answer based on this information:",
-            invocation_state={"system_prompt": ANSWER_SYSTEM_PROMPT}
-        )
+        # Generate a clear, conversational answer using the retrieved information, in the context of the
+        # conversation so far when CONVERSATION_CONTEXT is on (ahead of the routing and retrieval tool calls)
+        agent.messages[:0] = history if history is not None else conversation.context_messages()
+        with trace_stage(trace, "answer", agent):
+            answer = run_agent(
+                agent,
+                f"User question: \"{query}\"\n\nInformation from knowledge base (only use 'Response'):\n{result_str}\n\nProvide a helpful answer based on this information:",
+                placeholder,
+                invocation_state={"system_prompt": ANSWER_SYSTEM_PROMPT}
+            )
         
         return str(answer)
 
-def run_memory_agent(query):
+def run_memory_agent(query, placeholder=None, agent=None):
     """Process a user query with the memory agent using OpenSearch backend."""
-    agent = get_memory_agent()
+    agent = agent if agent is not None else get_memory_agent()
     USER_ID = "streamlit_user"
     
     # Process the query directly with the memory agent
+    if placeholder is not None:
+        return run_agent(agent, query, placeholder, user_id=USER_ID)
     response = agent(query, user_id=USER_ID)
     
     # Extract the response content
@@ -356,71 +413,62 @@ def run_memory_agent(query):
     else:
         return str(response)
 
-# Get user input
-query = st.chat_input("Ask your question here...")
+# Get user input (disabled while an answer is being prepared)
+query = st.chat_input("Ask your question here...", disabled=st.session_state.get("agent_job") is not None)
 
 if query:
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": query})
+    conversation.add("user", query)
     
     # Display user message
     with st.chat_message("user"):
         st.markdown(query)
     
-    # Display assistant response
-    with st.chat_message("assistant"):
-        message_placeholder = st.empty()
+    # Resolve agents, settings and history here: the job runs outside of the Streamlit session
+    trace = QueryTrace("streamlit_app", stage_log)
+    if selected_agent == "Memory Agent (OpenSearch)" and has_opensearch:
+        memory_agent = get_memory_agent()
         
-        try:
-            # Check if we're using the memory agent or the regular flow
-            if selected_agent == "Memory Agent (OpenSearch)" and has_opensearch:
-                with st.spinner("Processing with Memory Agent..."):
-                    content = run_memory_agent(query)
-            else:
+        def process_query(job):
+            job.set_status("Processing with Memory Agent...")
+            try:
+                with trace.stage("memory_agent", memory_agent):
+                    return run_memory_agent(query, job if use_streaming else None, memory_agent)
+            finally:
+                trace.finish(agent="memory")
+    else:
+        with trace.stage("router") as stage:
+            decision = query_router.route(query)
+            stage.update(source=decision.source, label=decision.label, confidence=decision.confidence)
+        speculation = start_speculative_retrieval(query, decision)
+        teacher_agent = get_teacher_agent()
+        kb_agent = get_kb_agent()
+        history = conversation.context_messages()
+        
+        def process_query(job):
+            action = None
+            try:
+                stream_to = job if use_streaming else None
                 # Determine which agent should handle the query
-                with st.spinner("Analyzing query..."):
-                    action = determine_action(query)
-                
-                content = ""
-                
+                job.set_status("Analyzing query...")
+                with trace.stage("classify", local=decision.action is not None):
+                    action = determine_action(query, decision, kb_agent)
+            
                 # Process with the appropriate agent
                 if action == "teacher":
-                    with st.spinner("Processing with Teacher Agent..."):
-                        teacher_agent = get_teacher_agent()
-                        content = teacher_agent(query)
-                else:
-                    with st.spinner("Processing with Knowledge Base Agent..."):
-                        content = run_kb_agent(query)
-            
-            # Display the response
-            message_placeholder.markdown(content)
-            
-            # Add assistant response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": content})
-            
-        except Exception as e:
-            message_placeholder.error(f"Error: {str(e)}")
-            st.session_state.messages.append({"role": "assistant", "content": f"Error: {str(e)}"})
-            if action == "teacher":
-                # Get the teacher agent
-                teacher_agent = get_teacher_agent()
-                
-                # Process the query with the teacher agent
-                with st.spinner("Consulting educational specialists..."):
-                    response = teacher_agent(query)
-                    content = str(response)
-            else:
-                # Process the query with the knowledge base agent
-                with st.spinner("Accessing knowledge base..."):
-                    content = run_kb_agent(query)
-            
-            # Display the response
-            message_placeholder.markdown(content)
-            
-            # Add assistant response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": content})
-            
-        except Exception as e:
-            error_message = f"An error occurred: {str(e)}"
-            message_placeholder.markdown(error_message)
-            st.session_state.messages.append({"role": "assistant", "content": error_message})
+                    # The router picked the teacher: the speculative lookup lost
+                    if speculation is not None:
+                        speculation.cancel()
+                    job.set_status("Processing with Teacher Agent...")
+                    with trace.stage("teacher", teacher_agent):
+                        return run_agent(teacher_agent, query, stream_to)
+                job.set_status("Processing with Knowledge Base Agent...")
+                return run_kb_agent(query, decision, speculation, stream_to, kb_agent, history, trace)
+            finally:
+                trace.finish(action=action)
+    
+    st.session_state.agent_job = submit_job(process_query)
+
+if st.session_state.get("agent_job") is not None:
+    with st.chat_message("assistant"):
+        show_agent_job(conversation)
@@ -0,0 +1,110 @@
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+from opensearchpy.serializer import JSONSerializer
+
+from kb_direct_ingest import BedrockEmbedder, DirectIngestor, FakeEmbedder, chunk_text, load_documents
+
+
+class StubOpenSearch:
+    """Bulk API of an OpenSearch client, keeping the indexed documents and rejecting texts marked REJECT"""
+    def __init__(self):
+        self.transport = SimpleNamespace(serializer=JSONSerializer())
+        self.documents = []
+        self.bulk_calls = 0
+
+    def bulk(self, body, **kwargs):
+        self.bulk_calls += 1
+        lines = [json.loads(line) for line in body.splitlines() if line]
+        items = []
+        for action, source in zip(lines[::2], lines[1::2]):
+            if "REJECT" in source["text"]:
+                items.append({"index": {"_index": action["index"]["_index"], "status": 400,
+                                        "error": {"type": "mapper_parsing_exception"}}})
+            else:
+                self.documents.append((action["index"]["_index"], source))
+                items.append({"index": {"_index": action["index"]["_index"], "status": 201}})
+        return {"took": 1, "errors": any(i["index"]["status"] >= 300 for i in items), "items": items}
+
+
+class CountingEmbedder(FakeEmbedder):
+    def __init__(self, dimension):
+        super().__init__(dimension)
+        self.batches = []
+
+    def embed(self, texts):
+        self.batches.append(len(texts))
+        return super().embed(texts)
+
+
+def test_chunk_text_overlaps_chunks():
+    words = [f"w{i}" for i in range(25)]
+    chunks = chunk_text(" ".join(words), max_tokens=10, overlap_percentage=20)
+    assert [c.split()[0] for c in chunks] == ["w0", "w8", "w16"]
+    assert all(len(c.split()) <= 10 for c in chunks)
+    assert chunks[-1].split()[-1] == "w24"
+    assert chunk_text("   ") == []
+
+
+def test_chunk_embed_and_bulk_index(tmp_path):
+    (tmp_path / "cats.txt").write_text(" ".join(f"cat{i}" for i in range(30)))
+    (tmp_path / "dogs.md").write_text("dogs bark")
+    (tmp_path / "notes.bin").write_bytes(b"\x00")
+    client = StubOpenSearch()
+    embedder = CountingEmbedder(dimension=8)
+    ingestor = DirectIngestor(client, "kb-index", embedder, embed_batch_size=2, chunk_size=2, thread_count=2,
+                              max_tokens=10, overlap_percentage=20)
+
+    stats = ingestor.ingest(load_documents(str(tmp_path)))
+
+    # cats.txt: 30 words in chunks of 10 every 8 words -> 4 chunks, dogs.md: 1 chunk
+    assert (stats["documents"], stats["indexed"], stats["failed"]) == (2, 5, 0)
+    assert embedder.batches == [2, 2, 1]
+    assert client.bulk_calls == 3
+    sources = sorted(json.loads(source["text-metadata"])["source"] for _, source in client.documents)
+    assert sources == ["cats.txt"] * 4 + ["dogs.md"]
+    for index, source in client.documents:
+        assert index == "kb-index"
+        assert len(source["vector"]) == 8
+        assert source["vector"] == FakeEmbedder(8).embed([source["text"]])[0]
+
+
+def test_failed_chunks_are_counted():
+    client = StubOpenSearch()
+    ingestor = DirectIngestor(client, "kb-index", FakeEmbedder(4))
+    stats = ingestor.ingest([("a.txt", "fine"), ("b.txt", "REJECT me")])
+    assert (stats["indexed"], stats["failed"]) == (1, 1)
+
+
+def test_byte_vectors_are_scaled_integers():
+    client = StubOpenSearch()
+    DirectIngestor(client, "kb-index", FakeEmbedder(16), vector_encoding="byte").ingest([("a.txt", "hello")])
+    vector = client.documents[0][1]["vector"]
+    assert all(isinstance(v, int) and -128 <= v <= 127 for v in vector)
+    assert max(abs(v) for v in vector) > 1
+
+
+class StubBedrockRuntime:
+    def __init__(self):
+        self.calls = []
+
+    def invoke_model(self, modelId, body):
+        body = json.loads(body)
+        self.calls.append((modelId, body))
+        if "texts" in body:
+            payload = {"embeddings": [[float(len(t))] for t in body["texts"]]}
+        else:
+            payload = {"embedding": [float(len(body["inputText"]))]}
+        return {"body": io.BytesIO(json.dumps(payload).encode())}
+
+
+@pytest.mark.parametrize("model_id, calls", [("amazon.titan-embed-text-v2:0", 3), ("cohere.embed-english-v3", 1)])
+def test_bedrock_embedder_batches(model_id, calls):
+    client = StubBedrockRuntime()
+    embedder = BedrockEmbedder(model_id, dimension=256, client=client, max_workers=2)
+    assert embedder.embed(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert len(client.calls) == calls
+    if model_id.startswith("amazon."):
+        assert client.calls[0][1]["dimensions"] == 256
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from kb_downloader import RangedDownloader
+
+SEGMENT = 1024
+
+
+class FileServer:
+    """Local HTTP server for one file, with Range / If-Range support, failures on demand and request counts"""
+    def __init__(self, content, etag='"v1"', ranges=True):
+        self.content = content
+        self.etag = etag
+        self.ranges = ranges
+        self.fail_ranges = set()
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                server.requests.append(("HEAD", None))
+                self.send_response(200)
+                self.send_headers(len(server.content))
+                self.end_headers()
+
+            def do_GET(self):
+                byte_range = self.headers.get("Range")
+                server.requests.append(("GET", byte_range))
+                if_range = self.headers.get("If-Range")
+                if byte_range and server.ranges and (if_range is None or if_range == server.etag):
+                    if byte_range in server.fail_ranges:
+                        self.send_error(503)
+                        return
+                    start, end = (int(x) for x in byte_range.split("=")[1].split("-"))
+                    body = server.content[start:end + 1]
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(server.content)}")
+                else:
+                    body = server.content
+                    self.send_response(200)
+                self.send_headers(len(body))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_headers(self, length):
+                self.send_header("Content-Length", str(length))
+                self.send_header("ETag", server.etag)
+                if server.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/dataset.zip"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def count(self, method):
+        return sum(1 for m, _ in self.requests if m == method)
+
+
+@pytest.fixture
+def content():
+    return os.urandom(10 * SEGMENT + 123)
+
+
+@pytest.fixture
+def server(content):
+    server = FileServer(content)
+    yield server
+    server.httpd.shutdown()
+
+
+def downloader():
+    return RangedDownloader(segment_size=SEGMENT, max_workers=4, max_attempts=1, timeout=5)
+
+
+def test_download_in_segments(server, content, tmp_path):
+    destination = tmp_path / "dataset.zip"
+    downloader().download(server.url, str(destination), sha256=hashlib.sha256(content).hexdigest())
+    assert destination.read_bytes() == content
+    assert server.count("GET") == 11
+    assert not os.path.exists(f"{destination}.part.json")
+
+
+def test_resume_after_partial_download(server, content, tmp_path):
+    destination = tmp_path / "dataset.zip"
+    server.fail_ranges = {f"bytes={3 * SEGMENT}-{4 * SEGMENT - 1}", f"bytes={7 * SEGMENT}-{8 * SEGMENT - 1}"}
+    with pytest.raises(IOError, match="2 segments"):
+        downloader().download(server.url, str(destination))
+    assert os.path.exists(f"{destination}.part.json")
+
+    server.fail_ranges = set()
+    server.requests.clear()
+    downloader().download(server.url, str(destination))
+    assert destination.read_bytes() == content
+    # Only the two missing segments are fetched, without probing the file again
+    assert server.count("HEAD") == 0
+    assert sorted(r for _, r in server.requests) == sorted([f"bytes={3 * SEGMENT}-{4 * SEGMENT - 1}",
+                                                            f"bytes={7 * SEGMENT}-{8 * SEGMENT - 1}"])
+
+
+def test_restart_when_the_remote_file_changed(server, tmp_path):
+    destination = tmp_path / "dataset.zip"
+    server.fail_ranges = {f"bytes=0-{SEGMENT - 1}"}
+    with pytest.raises(IOError):
+        downloader().download(server.url, str(destination))
+
+    server.fail_ranges = set()
+    server.content = os.urandom(12 * SEGMENT)
+    server.etag = '"v2"'
+    downloader().download(server.url, str(destination))
+    assert destination.read_bytes() == server.content
+
+
+def test_single_stream_without_range_support(content, tmp_path):
+    server = FileServer(content, ranges=False)
+    try:
+        destination = tmp_path / "dataset.zip"
+        downloader().download(server.url, str(destination))
+        assert destination.read_bytes() == content
+        assert server.requests[-1] == ("GET", None)
+    finally:
+        server.httpd.shutdown()
+
+
+def test_checksum_mismatch(server, tmp_path):
+    with pytest.raises(IOError, match="checksum"):
+        downloader().download(server.url, str(tmp_path / "dataset.zip"), sha256="0" * 64)
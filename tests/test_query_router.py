@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from query_router import (
+    TRAINING_EXAMPLES, WEIGHTS_PATH, QueryRouter, examples_fingerprint, features, query_router,
+)
+
+# Chat the routing examples say nothing about: the LLM prompt has to decide these
+OUT_OF_DISTRIBUTION = [
+    "What is your name?",
+    "Is my essay good?",
+    "I think the answer is 42",
+    "Who are you?",
+    "What time is it?",
+    "What's the weather like?",
+    "How are you today?",
+    "Can you give me an example?",
+    "That makes sense",
+    "I love this app",
+    "Hello!",
+    "ok",
+]
+
+
+def test_shipped_weights_match_the_examples():
+    with open(WEIGHTS_PATH) as f:
+        assert json.load(f)["examples"] == examples_fingerprint(TRAINING_EXAMPLES)
+
+
+def test_every_example_routes_to_its_own_label():
+    assert query_router.misrouted() == []
+
+
+@pytest.mark.parametrize("query", OUT_OF_DISTRIBUTION)
+def test_unfamiliar_queries_fall_back_to_the_llm(query):
+    decision = query_router._decide(query)
+    assert decision.action is None
+    assert decision.kb_action is None
+
+
+def test_fallback_is_counted():
+    router = QueryRouter(query_router.weights)
+    for query in OUT_OF_DISTRIBUTION:
+        router.route(query)
+    stats = router.stats()
+    assert stats["fallback"] == len(OUT_OF_DISTRIBUTION)
+    assert stats["hit_rate"] == 0.0
+
+
+@pytest.mark.parametrize("query, action, kb_action", [
+    ("What is my favorite food?", "knowledgebase", "retrieve"),
+    ("What did I tell you about my exam?", "knowledgebase", "retrieve"),
+    ("My favorite food is pizza", "knowledgebase", "store"),
+    ("Remember that my sister is called Jane", "knowledgebase", "store"),
+    ("Explain recursion", "teacher", None),
+    ("How do I sort a list in Python?", "teacher", None),
+    ("Solve 3x + 2 = 11", "teacher", None),
+])
+def test_rules(query, action, kb_action):
+    decision = query_router._decide(query)
+    assert (decision.action, decision.kb_action, decision.source) == (action, kb_action, "rule")
+
+
+def test_teacher_decisions_do_not_store_or_retrieve():
+    decision = query_router._decide("what is photosynthesis")
+    assert decision.action in ("teacher", None)
+    assert decision.kb_action is None
+
+
+def test_coverage():
+    assert query_router.coverage(features("What is my name?")) == 1.0
+    assert query_router.coverage(features("Quantum chromodynamics")) == 0.0